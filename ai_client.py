@@ -0,0 +1,328 @@
+"""
+AI Client
+Shared Anthropic client for lesson content: pooled connections, a concurrency
+cap, retries with backoff, and a local stub server for offline load tests
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Failures worth another attempt; anything else (bad request, auth) fails fast
+RETRYABLE_ERRORS = ('APIConnectionError', 'APITimeoutError', 'RateLimitError', 'InternalServerError')
+
+_sdk = None
+
+
+def load_sdk():
+    """Import the Anthropic SDK on first use and return (module, retryable error classes)
+
+    It is the slowest import of the app and only needed when an API key is set, so
+    the offline stub and keyless deployments never load it.
+    """
+    global _sdk
+    if _sdk is None:
+        import anthropic
+        _sdk = (anthropic, tuple(getattr(anthropic, name) for name in RETRYABLE_ERRORS))
+    return _sdk
+
+
+class AIClientError(Exception):
+    """Raised when the model could not produce a usable answer"""
+
+
+class AIClient:
+    """Thread-safe completion client shared by all jobs in one worker process"""
+
+    def __init__(self, api_key, base_url=None, model='claude-2.1', max_concurrency=4,
+                 timeout=60.0, max_retries=3, backoff=1.0, max_tokens=4000):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_tokens = max_tokens
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._client = None
+        self._client_pid = None
+        # Event-loop side for the async execution mode, bound to the loop that created it
+        self._async_loop = None
+        self._async_client = None
+        self._async_slots = None
+        self.requests = 0
+        self.failures = 0
+
+    @classmethod
+    def from_environment(cls):
+        """Build a client from ANTHROPIC_API_KEY / LESSON_AI_* settings, or None when not configured"""
+        api_key = os.environ.get('ANTHROPIC_API_KEY')
+        if not api_key:
+            return None
+        return cls(
+            api_key,
+            base_url=os.environ.get('LESSON_AI_BASE_URL') or None,
+            model=os.environ.get('LESSON_AI_MODEL', 'claude-2.1'),
+            max_concurrency=int(os.environ.get('LESSON_AI_CONCURRENCY', 4)),
+            timeout=float(os.environ.get('LESSON_AI_TIMEOUT', 60)),
+            max_retries=int(os.environ.get('LESSON_AI_RETRIES', 3))
+        )
+
+    def complete(self, prompt):
+        """Send one prompt and return the completion text"""
+        # Waiting for a slot counts against the same timeout as the call itself
+        if not self._slots.acquire(timeout=self.timeout):
+            raise AIClientError('Timed out waiting for a free AI connection')
+        try:
+            return self._complete_with_retries(prompt)
+        finally:
+            self._slots.release()
+
+    def stream(self, prompt):
+        """Yield the completion text as it arrives
+
+        A failed call is retried only while nothing has been received yet;
+        once text has been handed out an error ends the stream.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise AIClientError('Timed out waiting for a free AI connection')
+        try:
+            anthropic, retryable = load_sdk()
+            client = self._get_client()
+            for attempt in range(self.max_retries + 1):
+                received = False
+                with self._lock:
+                    self.requests += 1
+                try:
+                    events = client.completions.create(
+                        model=self.model,
+                        max_tokens_to_sample=self.max_tokens,
+                        prompt=f"{anthropic.HUMAN_PROMPT} {prompt}{anthropic.AI_PROMPT}",
+                        stream=True,
+                    )
+                    for event in events:
+                        received = True
+                        yield event.completion
+                    return
+                except retryable as e:
+                    with self._lock:
+                        self.failures += 1
+                    if received or attempt == self.max_retries:
+                        raise AIClientError(f'AI stream failed after {attempt + 1} attempts: {str(e)}')
+                    self._wait_before_retry(attempt, e)
+                except anthropic.APIError as e:
+                    with self._lock:
+                        self.failures += 1
+                    raise AIClientError(f'AI request rejected: {str(e)}')
+        finally:
+            self._slots.release()
+
+    async def astream(self, prompt):
+        """Async version of stream() for the event loop of the async execution mode"""
+        anthropic, retryable = load_sdk()
+        client, slots = await self._get_async_client()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise AIClientError('Timed out waiting for a free AI connection')
+        try:
+            for attempt in range(self.max_retries + 1):
+                received = False
+                with self._lock:
+                    self.requests += 1
+                try:
+                    events = await client.completions.create(
+                        model=self.model,
+                        max_tokens_to_sample=self.max_tokens,
+                        prompt=f"{anthropic.HUMAN_PROMPT} {prompt}{anthropic.AI_PROMPT}",
+                        stream=True,
+                    )
+                    async for event in events:
+                        received = True
+                        yield event.completion
+                    return
+                except retryable as e:
+                    with self._lock:
+                        self.failures += 1
+                    if received or attempt == self.max_retries:
+                        raise AIClientError(f'AI stream failed after {attempt + 1} attempts: {str(e)}')
+                    await asyncio.sleep(self._retry_delay(attempt, e))
+                except anthropic.APIError as e:
+                    with self._lock:
+                        self.failures += 1
+                    raise AIClientError(f'AI request rejected: {str(e)}')
+        finally:
+            slots.release()
+
+    def warm(self):
+        """Import the SDK now, e.g. in a preloading master process before workers fork"""
+        load_sdk()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'model': self.model,
+                'max_concurrency': self.max_concurrency,
+                'requests': self.requests,
+                'failures': self.failures
+            }
+
+    def _complete_with_retries(self, prompt):
+        anthropic, retryable = load_sdk()
+        client = self._get_client()
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                self.requests += 1
+            try:
+                response = client.completions.create(
+                    model=self.model,
+                    max_tokens_to_sample=self.max_tokens,
+                    prompt=f"{anthropic.HUMAN_PROMPT} {prompt}{anthropic.AI_PROMPT}",
+                )
+                return response.completion
+            except retryable as e:
+                with self._lock:
+                    self.failures += 1
+                if attempt == self.max_retries:
+                    raise AIClientError(f'AI request failed after {attempt + 1} attempts: {str(e)}')
+                self._wait_before_retry(attempt, e)
+            except anthropic.APIError as e:
+                with self._lock:
+                    self.failures += 1
+                raise AIClientError(f'AI request rejected: {str(e)}')
+
+    def _wait_before_retry(self, attempt, error):
+        time.sleep(self._retry_delay(attempt, error))
+
+    def _retry_delay(self, attempt, error):
+        # Exponential backoff with jitter so parallel jobs do not retry in lockstep
+        delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+        print(f"AI request failed ({type(error).__name__}), retrying in {delay:.1f}s")
+        return delay
+
+    def _get_client(self):
+        """One pooled HTTP client per process, created after any fork"""
+        anthropic, _ = load_sdk()
+        import httpx
+        with self._lock:
+            if self._client is None or self._client_pid != os.getpid():
+                limits = httpx.Limits(max_connections=self.max_concurrency,
+                                      max_keepalive_connections=self.max_concurrency)
+                self._client = anthropic.Anthropic(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    max_retries=0,
+                    http_client=httpx.Client(limits=limits, timeout=self.timeout),
+                )
+                self._client_pid = os.getpid()
+            return self._client
+
+    async def _get_async_client(self):
+        """Async client and connection slots for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            # Building the client (SSL context, connection pool) would stall the loop
+            client = await loop.run_in_executor(None, self._new_async_client)
+            with self._lock:
+                if self._async_loop is not loop:
+                    self._async_client = client
+                    self._async_slots = asyncio.Semaphore(self.max_concurrency)
+                    self._async_loop = loop
+        return self._async_client, self._async_slots
+
+    def _new_async_client(self):
+        anthropic, _ = load_sdk()
+        import httpx
+        limits = httpx.Limits(max_connections=self.max_concurrency,
+                              max_keepalive_connections=self.max_concurrency)
+        client = anthropic.AsyncAnthropic(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            timeout=self.timeout,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=limits, timeout=self.timeout),
+        )
+        # The SDK probes the platform (a `file` subprocess) for the first request's headers
+        client.default_headers
+        return client
+
+
+class StubCompletionHandler(BaseHTTPRequestHandler):
+    """Answers /v1/complete like the Anthropic API with canned lesson sections"""
+
+    latency = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+
+        topic_match = re.search(r'- Topic: (.+)', body.get('prompt', ''))
+        topic = topic_match.group(1).strip() if topic_match else 'the topic'
+        sections = [
+            {'section': 'objectives',
+             'content': f"Students will analyze and evaluate {topic} (stub model response)."},
+            {'section': 'skills', 'content': ["Critical Thinking", "Collaboration", "Problem Solving"]}
+        ]
+        text = ' ' + '\n'.join(json.dumps(section) for section in sections)
+
+        if not body.get('stream'):
+            time.sleep(self.latency)
+            self._send(200, 'application/json', json.dumps({
+                'completion': text,
+                'stop_reason': 'stop_sequence',
+                'model': body.get('model', 'stub')
+            }).encode('utf-8'))
+            return
+
+        # Stream one line per event, spreading the latency over the answer
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        lines = text.split('\n')
+        for number, line in enumerate(lines):
+            time.sleep(self.latency / len(lines))
+            event = {'completion': line + ('\n' if number < len(lines) - 1 else ''),
+                     'stop_reason': None, 'model': body.get('model', 'stub')}
+            self.wfile.write(f"event: completion\ndata: {json.dumps(event)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+    def _send(self, status, content_type, payload):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_stub_server(port=8089, latency=1.0):
+    """Serve fake completions so generation can be load-tested without network access"""
+    StubCompletionHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubCompletionHandler)
+    print(f"Stub AI server on http://127.0.0.1:{port} ({latency}s latency)")
+    print(f"Use: ANTHROPIC_API_KEY=stub LESSON_AI_BASE_URL=http://127.0.0.1:{port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stub of the Anthropic completions API')
+    parser.add_argument('--stub', action='store_true', help='run the stub server')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds before each answer')
+    args = parser.parse_args()
+    if args.stub:
+        run_stub_server(args.port, args.latency)
+    else:
+        parser.print_help()
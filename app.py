@@ -3,13 +3,31 @@ Al Adhwa Private School - AI Lesson Plan Generator
 Main Flask Application
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+import time
+BOOT_STARTED = time.perf_counter()
+
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 import os
 from datetime import datetime
 import json
 from lesson_generator import LessonPlanGenerator
+from jobs import JobManager, QueueFullError, FINISHED_STATES
+from cache import ContentCache, PackageCache, package_key
+from ai_client import AIClient
+from storage import StorageManager
+from question_store import QuestionStore
+from metrics import metrics
 import traceback
+import threading
+import re
+import csv
+import uuid
+from werkzeug.utils import secure_filename
+import fast_docx
+
+# Boot phases in seconds, reported on /health and in the startup log line
+STARTUP = {'pid': os.getpid(), 'imports': round(time.perf_counter() - BOOT_STARTED, 4)}
 
 app = Flask(__name__)
 CORS(app)
@@ -18,13 +36,151 @@ CORS(app)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'output'
+app.config['JOB_FOLDER'] = os.path.join(app.config['OUTPUT_FOLDER'], 'jobs')
+app.config['JOB_WORKERS'] = int(os.environ.get('LESSON_JOB_WORKERS', 2))
+app.config['JOB_MAX_PENDING'] = int(os.environ.get('LESSON_JOB_MAX_PENDING', 100))
+# 'thread' runs each job on its own pool thread; 'async' awaits the AI call on an event loop
+# and renders documents in executors, keeping many generations in flight per process
+app.config['EXECUTION_MODE'] = os.environ.get('LESSON_EXECUTION_MODE', 'thread').lower()
+app.config['ASYNC_MAX_JOBS'] = int(os.environ.get('LESSON_ASYNC_MAX_JOBS', 32))
+# Identical lesson requests while one is being generated attach to that job (in any worker)
+app.config['JOB_COALESCE'] = os.environ.get('LESSON_JOB_COALESCE', '1').lower() not in ('0', 'false', 'off', 'no')
+app.config['JOB_STALE_AFTER'] = int(os.environ.get('LESSON_JOB_STALE_AFTER', 900))
+app.config['BATCH_MAX_LESSONS'] = int(os.environ.get('LESSON_BATCH_MAX_LESSONS', 60))
+app.config['CACHE_FOLDER'] = os.path.join(app.config['OUTPUT_FOLDER'], 'cache')
+app.config['CONTENT_CACHE_ENTRIES'] = int(os.environ.get('LESSON_CONTENT_CACHE_ENTRIES', 256))
+app.config['CONTENT_CACHE_TTL'] = int(os.environ.get('LESSON_CONTENT_CACHE_TTL', 7 * 24 * 3600))
+app.config['PACKAGE_CACHE_MAX_MB'] = int(os.environ.get('LESSON_PACKAGE_CACHE_MAX_MB', 512))
+app.config['PACKAGE_CACHE_TTL'] = int(os.environ.get('LESSON_PACKAGE_CACHE_TTL', 24 * 3600))
+app.config['STORAGE_FOLDER'] = os.path.join(app.config['OUTPUT_FOLDER'], 'files')
+app.config['STORAGE_MAX_MB'] = int(os.environ.get('LESSON_STORAGE_MAX_MB', 2048))
+app.config['STORAGE_MAX_FILES'] = int(os.environ.get('LESSON_STORAGE_MAX_FILES', 5000))
+app.config['STORAGE_TTL'] = int(os.environ.get('LESSON_STORAGE_TTL', 24 * 3600))
+app.config['STORAGE_SWEEP_INTERVAL'] = int(os.environ.get('LESSON_STORAGE_SWEEP_INTERVAL', 300))
+# SQLite index of every generated question, served by /api/question-bank (off when empty)
+app.config['QUESTION_STORE'] = os.environ.get('LESSON_QUESTION_STORE',
+                                              os.path.join(app.config['OUTPUT_FOLDER'], 'questions.sqlite3'))
+# Packages never change once written, so browsers may keep them until they expire from storage
+app.config['DOWNLOAD_MAX_AGE'] = int(os.environ.get('LESSON_DOWNLOAD_MAX_AGE', 24 * 3600))
+# Hand file bodies to a fronting nginx/Apache with X-Sendfile instead of streaming them from Python
+app.config['USE_X_SENDFILE'] = os.environ.get('LESSON_X_SENDFILE', '0').lower() in ('1', 'true', 'on', 'yes')
+app.config['EVENTS_POLL_INTERVAL'] = float(os.environ.get('LESSON_EVENTS_POLL_INTERVAL', 0.25))
+app.config['EVENTS_KEEPALIVE'] = float(os.environ.get('LESSON_EVENTS_KEEPALIVE', 15))
+# An events stream holds a server thread; end it after this long and let the browser reconnect
+app.config['EVENTS_MAX_STREAM'] = float(os.environ.get('LESSON_EVENTS_MAX_STREAM', 20))
+# Append request bodies to this JSONL file for benchmarks/loadtest.py --replay (off when empty)
+app.config['RECORD_REQUESTS'] = os.environ.get('LESSON_RECORD_REQUESTS', '')
 
 # Ensure folders exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 
+# Cache of generated content shared by identical lesson requests
+content_cache = ContentCache(os.path.join(app.config['CACHE_FOLDER'], 'content'),
+                             max_entries=app.config['CONTENT_CACHE_ENTRIES'],
+                             ttl=app.config['CONTENT_CACHE_TTL'])
+
+# Finished ZIP packages, reused when the exact same lesson is requested again
+package_cache = PackageCache(os.path.join(app.config['CACHE_FOLDER'], 'packages'),
+                             max_bytes=app.config['PACKAGE_CACHE_MAX_MB'] * 1024 * 1024,
+                             ttl=app.config['PACKAGE_CACHE_TTL'])
+
+# Index, quota and expiry of generated packages
+storage = StorageManager(app.config['STORAGE_FOLDER'],
+                         max_bytes=app.config['STORAGE_MAX_MB'] * 1024 * 1024,
+                         max_files=app.config['STORAGE_MAX_FILES'],
+                         ttl=app.config['STORAGE_TTL'],
+                         sweep_interval=app.config['STORAGE_SWEEP_INTERVAL'])
+
+# Questions of all generated lessons, for assembling unit question banks
+question_store = QuestionStore(app.config['QUESTION_STORE']) if app.config['QUESTION_STORE'] else None
+
+# Shared AI client for this worker (None until ANTHROPIC_API_KEY is set)
+ai_client = AIClient.from_environment()
+
+STARTUP['services'] = round(time.perf_counter() - BOOT_STARTED - STARTUP['imports'], 4)
+
 # Initialize lesson plan generator
-generator = LessonPlanGenerator()
+generator = LessonPlanGenerator(content_cache=content_cache, package_cache=package_cache,
+                                ai_client=ai_client, storage=storage, question_store=question_store)
+
+# Parse templates and load lazily imported libraries now, so a preloading gunicorn
+# master does it once and every worker shares the result copy-on-write
+warm_started = time.perf_counter()
+generator.warm_templates()
+fast_docx.warm()
+if ai_client:
+    ai_client.warm()
+STARTUP['warm_up'] = round(time.perf_counter() - warm_started, 4)
+
+# Background job queue for generation requests
+async_jobs = app.config['EXECUTION_MODE'] == 'async'
+jobs = JobManager(app.config['JOB_FOLDER'],
+                  max_workers=app.config['ASYNC_MAX_JOBS'] if async_jobs else app.config['JOB_WORKERS'],
+                  max_pending=app.config['JOB_MAX_PENDING'],
+                  mode=app.config['EXECUTION_MODE'],
+                  stale_after=app.config['JOB_STALE_AFTER'])
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Queue and cache state is read when /metrics is scraped
+metrics.add_collector('jobs', jobs.stats)
+metrics.add_collector('content_cache', content_cache.stats)
+metrics.add_collector('package_cache', package_cache.stats)
+metrics.add_collector('storage', storage.stats)
+if question_store:
+    metrics.add_collector('question_store', question_store.stats)
+if ai_client:
+    metrics.add_collector('ai', ai_client.stats)
+metrics.add_collector('startup', lambda: {phase: value for phase, value in STARTUP.items() if not phase.endswith('pid')})
+
+STARTUP['total'] = round(time.perf_counter() - BOOT_STARTED, 4)
+print(f"Startup in {STARTUP['total']:.2f}s (imports {STARTUP['imports']:.2f}s, "
+      f"services {STARTUP['services']:.2f}s, warm-up {STARTUP['warm_up']:.2f}s)")
+
+
+def worker_started(boot_seconds=None):
+    """Called in each gunicorn worker after fork; records how long the worker took to boot"""
+    STARTUP['worker_pid'] = os.getpid()
+    STARTUP['preloaded'] = os.getpid() != STARTUP['pid']
+    if boot_seconds is not None:
+        STARTUP['worker_boot'] = round(boot_seconds, 4)
+
+@app.before_request
+def start_request_timer():
+    if metrics.enabled:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    if metrics.enabled and 'request_started' in g:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.inc('lesson_http_requests_total', endpoint=endpoint, code=response.status_code)
+        metrics.observe('lesson_http_request_seconds', time.perf_counter() - g.request_started,
+                        endpoint=endpoint)
+    if app.config['RECORD_REQUESTS'] and request.endpoint in RECORDED_ENDPOINTS:
+        record_traffic(response)
+    return response
+
+# Endpoints whose requests are written to the traffic recording
+RECORDED_ENDPOINTS = ('generate_lesson_plan', 'generate_batch', 'get_month_value', 'download_file')
+record_lock = threading.Lock()
+
+def record_traffic(response):
+    """Append one replayable request to the RECORD_REQUESTS log"""
+    entry = {
+        'time': time.time(),
+        'method': request.method,
+        'path': request.path,
+        'json': request.get_json(silent=True),
+        'status': response.status_code
+    }
+    try:
+        with record_lock:
+            with open(app.config['RECORD_REQUESTS'], 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+    except OSError as e:
+        print(f"Could not record request: {str(e)}")
 
 # Month to Value mapping
 MONTH_VALUES = {
@@ -69,49 +225,56 @@ def get_month_value():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+REQUIRED_FIELDS = ['date', 'semester', 'grade', 'subject', 'topic', 'period']
+
+def build_lesson_data(data):
+    """Validate request fields and return (lesson_data, error message)"""
+    for field in REQUIRED_FIELDS:
+        if field not in data or not data[field]:
+            return None, f'Missing required field: {field}'
+    
+    lesson_data = {
+        'date': data['date'],
+        'semester': data['semester'],
+        'grade': data['grade'],
+        'subject': data['subject'],
+        'topic': data['topic'],
+        'period': data['period'],
+        'standards': data.get('standards', []),
+        'digital_platform': data.get('digital_platform', ''),
+        'gifted_talented': data.get('gifted_talented', False),
+        'ppt_style': data.get('ppt_style', '7E Model'),
+        'value': data.get('value', '')
+    }
+    return lesson_data, None
+
 @app.route('/api/generate-lesson-plan', methods=['POST'])
 def generate_lesson_plan():
     """Generate complete lesson plan package"""
     try:
         data = request.json
         
-        # Validate required fields
-        required_fields = ['date', 'semester', 'grade', 'subject', 'topic', 'period']
-        for field in required_fields:
-            if field not in data or not data[field]:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
+        # Validate required fields and extract form data
+        lesson_data, error = build_lesson_data(data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Extract form data
-        lesson_data = {
-            'date': data['date'],
-            'semester': data['semester'],
-            'grade': data['grade'],
-            'subject': data['subject'],
-            'topic': data['topic'],
-            'period': data['period'],
-            'standards': data.get('standards', []),
-            'digital_platform': data.get('digital_platform', ''),
-            'gifted_talented': data.get('gifted_talented', False),
-            'ppt_style': data.get('ppt_style', '7E Model'),
-            'value': data.get('value', '')
-        }
+        # Queue lesson plan package generation
+        print(f"Queueing lesson plan for: {lesson_data['topic']}")
+        try:
+            generate = generator.generate_complete_package_async if async_jobs else generator.generate_complete_package
+            key = package_key(lesson_data, generator.compression_policy) if app.config['JOB_COALESCE'] else None
+            job = jobs.submit(generate, lesson_data, key=key)
+        except QueueFullError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 503
         
-        # Generate lesson plan package
-        print(f"Generating lesson plan for: {lesson_data['topic']}")
-        result = generator.generate_complete_package(lesson_data)
-        
-        if result['status'] == 'success':
-            return jsonify({
-                'status': 'success',
-                'message': 'Lesson plan package generated successfully!',
-                'files': result['files'],
-                'download_url': result['download_url']
-            })
-        else:
-            return jsonify({
-                'status': 'error',
-                'message': result.get('message', 'Generation failed')
-            }), 500
+        return jsonify({
+            'status': 'queued',
+            'job_id': job['id'],
+            'coalesced': job.get('coalesced', False),
+            'status_url': f"/api/jobs/{job['id']}",
+            'events_url': f"/api/jobs/{job['id']}/events"
+        }), 202
     
     except Exception as e:
         print(f"Error in generate_lesson_plan: {str(e)}")
@@ -121,22 +284,255 @@ def generate_lesson_plan():
             'message': f'Server error: {str(e)}'
         }), 500
 
-@app.route('/api/download/<filename>')
-def download_file(filename):
-    """Download generated file"""
+def read_batch_csv(upload):
+    """Save an uploaded CSV of lessons to the uploads folder and parse it into dicts
+
+    Columns match the JSON fields; standards are separated by ';' and
+    gifted_talented accepts yes/true/1.
+    """
+    upload_path = os.path.join(app.config['UPLOAD_FOLDER'],
+                               f"{uuid.uuid4().hex}_{secure_filename(upload.filename or 'lessons.csv')}")
+    upload.save(upload_path)
+    try:
+        with open(upload_path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+    finally:
+        os.remove(upload_path)
+    
+    lessons = []
+    for row in rows:
+        row = {(key or '').strip(): (value or '').strip() for key, value in row.items()}
+        row['standards'] = [item.strip() for item in row.get('standards', '').split(';') if item.strip()]
+        row['gifted_talented'] = row.get('gifted_talented', '').lower() in ('1', 'yes', 'true', 'y')
+        if not row.get('ppt_style'):
+            row.pop('ppt_style', None)
+        lessons.append(row)
+    return lessons
+
+@app.route('/api/generate-batch', methods=['POST'])
+def generate_batch():
+    """Generate a whole unit of lesson plans as one ZIP"""
     try:
-        file_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
+        if 'file' in request.files:
+            specs = read_batch_csv(request.files['file'])
         else:
-            return jsonify({'error': 'File not found'}), 404
+            specs = (request.json or {}).get('lessons', [])
+        
+        if not isinstance(specs, list) or not specs:
+            return jsonify({'error': 'Provide a non-empty "lessons" list or a CSV file'}), 400
+        if len(specs) > app.config['BATCH_MAX_LESSONS']:
+            return jsonify({'error': f"A batch can contain at most {app.config['BATCH_MAX_LESSONS']} lessons"}), 400
+        
+        lessons = []
+        for number, spec in enumerate(specs, 1):
+            lesson_data, error = build_lesson_data(spec if isinstance(spec, dict) else {})
+            if error:
+                return jsonify({'error': f'Lesson {number}: {error}'}), 400
+            if not lesson_data['value']:
+                lesson_data['value'] = MONTH_VALUES.get(datetime.strptime(lesson_data['date'], '%Y-%m-%d').month, "Respect/Care")
+            lessons.append(lesson_data)
+        
+        print(f"Queueing batch of {len(lessons)} lessons")
+        steps = (['Generating AI content']
+                 + [f"Lesson {number}: {lesson['topic']}" for number, lesson in enumerate(lessons, 1)]
+                 + ['Packaging files'])
+        try:
+            job = jobs.submit(generator.generate_batch_package, lessons, steps=steps, kind='batch')
+        except QueueFullError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 503
+        
+        return jsonify({
+            'status': 'queued',
+            'job_id': job['id'],
+            'lessons': len(lessons),
+            'status_url': f"/api/jobs/{job['id']}"
+        }), 202
+    
+    except ValueError as e:
+        return jsonify({'error': f'Invalid lesson data: {str(e)}'}), 400
+    except Exception as e:
+        print(f"Error in generate_batch: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            'status': 'error',
+            'message': f'Server error: {str(e)}'
+        }), 500
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Report progress of a generation job"""
+    if not JOB_ID_PATTERN.match(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+    
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    response = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'message': job['message'],
+        'step': job['step'],
+        'total_steps': job['total_steps'],
+        'steps': job['steps']
+    }
+    result = job.get('result') or {}
+    if job['status'] == 'success':
+        response['files'] = result.get('files', {})
+        response['download_url'] = result.get('download_url')
+        response['timings'] = result.get('timings', {})
+    
+    return jsonify(response)
+
+def format_event(event):
+    """One Server-Sent Events message for a job event"""
+    payload = json.dumps(event)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream job progress and finished AI content sections as Server-Sent Events"""
+    if not JOB_ID_PATTERN.match(job_id) or jobs.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    # EventSource sends Last-Event-ID when it reconnects; resume after it
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('after', 0))
+    except ValueError:
+        last_id = 0
+    
+    def stream():
+        sent = last_id
+        opened = last_write = time.time()
+        # EventSource reconnects this many milliseconds after a stream ends
+        yield "retry: 1000\n\n"
+        while True:
+            job, events = jobs.events(job_id, after=sent)
+            if job is None:
+                return
+            for event in events:
+                if event['type'] == 'complete':
+                    event = dict(event, download_url=(job.get('result') or {}).get('download_url'))
+                yield format_event(event)
+                sent = event['id']
+                last_write = time.time()
+            # The event log is complete once the job state says it finished
+            if job['status'] in FINISHED_STATES:
+                return
+            if time.time() - last_write >= app.config['EVENTS_KEEPALIVE']:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                last_write = time.time()
+            if time.time() - opened >= app.config['EVENTS_MAX_STREAM']:
+                # Frees the thread; the browser resumes from Last-Event-ID on a new request
+                return
+            time.sleep(app.config['EVENTS_POLL_INTERVAL'])
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/download/<artifact_id>')
+def download_file(artifact_id):
+    """Download generated file by artifact id, with Range and conditional GET support"""
+    try:
+        with metrics.span('lesson_stage_seconds', kind='download', stage='download'):
+            artifact = storage.get(artifact_id) if JOB_ID_PATTERN.match(artifact_id) else None
+            if artifact is None:
+                metrics.inc('lesson_downloads_total', result='not_found')
+                return jsonify({'error': 'File not found'}), 404
+
+            # send_file answers Range requests with 206 and If-None-Match with 304; full
+            # bodies go through wsgi.file_wrapper, which gunicorn serves with sendfile()
+            response = send_file(os.path.abspath(artifact['path']), as_attachment=True,
+                                 download_name=artifact['name'], etag=artifact['sha256'] or True,
+                                 conditional=True, max_age=app.config['DOWNLOAD_MAX_AGE'])
+            response.cache_control.public = False
+            response.cache_control.private = True
+            response.cache_control.immutable = True
+            if response.status_code == 304:
+                metrics.inc('lesson_downloads_total', result='not_modified')
+            else:
+                metrics.inc('lesson_downloads_total', result='partial' if response.status_code == 206 else 'found')
+                storage.mark_downloaded(artifact_id)
+            return response
+    except Exception as e:
+        metrics.inc('lesson_stage_errors_total', stage='download')
+        return jsonify({'error': str(e)}), 500
+
+def bounded_int_arg(name, default, maximum):
+    """Integer query argument clamped to 1..maximum; ValueError when it is not an integer"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return max(1, min(int(value), maximum))
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
+@app.route('/api/question-bank')
+def question_bank():
+    """Search stored questions by subject, grade, topic, dok, task_type and text (q)"""
+    if question_store is None:
+        return jsonify({'error': 'Question store is disabled'}), 404
+    try:
+        dok = request.args.get('dok')
+        questions = question_store.query(
+            subject=request.args.get('subject'),
+            grade=request.args.get('grade'),
+            topic=request.args.get('topic'),
+            dok=int(dok) if dok else None,
+            task_type=request.args.get('task_type'),
+            text=request.args.get('q'),
+            limit=bounded_int_arg('limit', 100, 1000)
+        )
+        return jsonify({'status': 'success', 'count': len(questions), 'questions': questions})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/question-bank/unit')
+def question_bank_unit():
+    """Question bank for a unit from stored questions, grouped by DOK level"""
+    if question_store is None:
+        return jsonify({'error': 'Question store is disabled'}), 404
+    try:
+        subject = request.args.get('subject')
+        grade = request.args.get('grade')
+        if not subject or not grade:
+            return jsonify({'error': 'subject and grade are required'}), 400
+        unit = question_store.assemble_unit(subject, grade, topics=request.args.getlist('topic'),
+                                            per_level=bounded_int_arg('per_level', 10, 200))
+        return jsonify(dict(unit, status='success'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'Al Adhwa Lesson Plan Generator'})
+    return jsonify({
+        'status': 'healthy',
+        'service': 'Al Adhwa Lesson Plan Generator',
+        'jobs': jobs.stats(),
+        'content_cache': content_cache.stats(),
+        'package_cache': package_cache.stats(),
+        'storage': storage.stats(),
+        'templates': generator.template_stats(),
+        'question_store': question_store.stats() if question_store else {'enabled': False},
+        'startup': STARTUP,
+        'ai': ai_client.stats() if ai_client else {'enabled': False}
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics, added up over all worker processes when LESSON_METRICS_DIR is set"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,203 @@
+"""
+Document Builder Benchmark
+Times generate_complete_package, each document builder and package_files over a
+matrix of synthetic lessons, and compares the results against a saved baseline
+
+Usage: python benchmarks/builders.py [--rounds 5] [--save baseline.json] [--compare baseline.json]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import itertools
+import statistics
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lesson_generator import LessonPlanGenerator, DOCUMENT_BUILDERS
+
+SUBJECTS = ('Physics', 'Biology', 'Math')
+PERIODS = ('1', '2', '3')
+GIFTED = (False, True)
+TOPICS = {
+    'short': 'Waves',
+    'long': 'Conservation of Momentum in One and Two Dimensional Elastic and Inelastic Collisions '
+            'with Real World Applications in Vehicle Safety Engineering'
+}
+
+
+def lesson_matrix(quick=False):
+    """Synthetic lesson_data for every subject / period / gifted / topic length combination"""
+    subjects = SUBJECTS[:1] if quick else SUBJECTS
+    periods = PERIODS[1:2] if quick else PERIODS
+    for subject, period, gifted, length in itertools.product(subjects, periods, GIFTED, TOPICS):
+        yield {
+            'date': '2025-10-12', 'semester': '1', 'grade': '10', 'subject': subject,
+            'topic': TOPICS[length], 'period': period, 'gifted_talented': gifted,
+            'standards': ['NGSS', 'AP'], 'digital_platform': 'PhET', 'value': 'Respect/Integrity',
+            'ppt_style': '7E Model'
+        }
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(func, rounds):
+    """Run func() rounds times; return latencies, the bytes it reports and its traced peak"""
+    latencies = []
+    written = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        written = func()
+        latencies.append(time.perf_counter() - started)
+
+    # One extra traced run: tracemalloc slows allocation, so it is kept out of the timings
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latencies, written, peak
+
+
+def run_cases(generator, lessons, rounds):
+    """Benchmark every case over all lessons and return {case: summary}"""
+    cases = {}
+
+    def builder_case(method, lesson_data, ai_content):
+        def run():
+            _, data = getattr(generator, method)(lesson_data, ai_content)
+            return len(data)
+        return run
+
+    def package_case(lesson_data, documents):
+        def run():
+            zip_path = generator.package_files(lesson_data, documents)
+            size = os.path.getsize(zip_path)
+            os.remove(zip_path)
+            return size
+        return run
+
+    def complete_case(lesson_data):
+        def run():
+            result = generator.generate_complete_package(lesson_data)
+            if result['status'] != 'success':
+                raise RuntimeError(result['message'])
+            zip_path = result['files']['package']
+            size = os.path.getsize(zip_path)
+            os.remove(zip_path)
+            return size
+        return run
+
+    samples = {}
+    for lesson_data in lessons:
+        ai_content = generator.generate_ai_content(lesson_data)
+        runs = [(name, builder_case(method, lesson_data, ai_content))
+                for name, method, _, _ in DOCUMENT_BUILDERS]
+        documents = [getattr(generator, method)(lesson_data, ai_content)
+                     for _, method, _, _ in DOCUMENT_BUILDERS]
+        runs.append(('package_files', package_case(lesson_data, documents)))
+        runs.append(('generate_complete_package', complete_case(lesson_data)))
+
+        for name, run in runs:
+            latencies, written, peak = measure(run, rounds)
+            entry = samples.setdefault(name, {'latencies': [], 'bytes': [], 'peaks': []})
+            entry['latencies'].extend(latencies)
+            entry['bytes'].append(written)
+            entry['peaks'].append(peak)
+
+    for name, entry in samples.items():
+        cases[name] = {
+            'p50_ms': round(statistics.median(entry['latencies']) * 1000, 3),
+            'p95_ms': round(percentile(entry['latencies'], 0.95) * 1000, 3),
+            'peak_alloc_kb': round(max(entry['peaks']) / 1024, 1),
+            'bytes': round(statistics.mean(entry['bytes']))
+        }
+    return cases
+
+
+def compare(cases, baseline, threshold):
+    """(case, metric, old, new) for every result worse than the baseline by more than threshold"""
+    regressions = []
+    for name, result in cases.items():
+        old = baseline.get('cases', {}).get(name)
+        if old is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'peak_alloc_kb', 'bytes'):
+            if old.get(metric) and result[metric] > old[metric] * (1 + threshold):
+                regressions.append((name, metric, old[metric], result[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=5, help='timed runs per case and lesson')
+    parser.add_argument('--quick', action='store_true', help='small lesson matrix for a fast check')
+    parser.add_argument('--render-mode', default='serial', help='render mode for generate_complete_package')
+    parser.add_argument('--docx-engine', default='python-docx',
+                        help="python-docx, fast, or a comma separated list of builders to write with fast_docx")
+    parser.add_argument('--save', metavar='PATH', help='write the results as a new baseline')
+    parser.add_argument('--compare', metavar='PATH', help='flag regressions against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='allowed slowdown / growth before a case counts as a regression')
+    args = parser.parse_args()
+
+    lessons = list(lesson_matrix(args.quick))
+    with tempfile.TemporaryDirectory() as workdir:
+        generator = LessonPlanGenerator(render_mode=args.render_mode, docx_engine=args.docx_engine)
+        generator.output_folder = workdir
+        generator.warm_templates()
+        # Builders and the pipeline log every step; keep the report readable
+        with redirect_stdout(io.StringIO()):
+            cases = run_cases(generator, lessons, args.rounds)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    print(f"{len(lessons)} lessons x {args.rounds} rounds, render mode {args.render_mode}, "
+          f"docx engine {args.docx_engine}, peak RSS {peak_rss_mb:.1f} MB")
+    print(f"{'case':<28} {'p50 ms':>9} {'p95 ms':>9} {'peak alloc KB':>14} {'bytes':>10}")
+    for name, result in cases.items():
+        print(f"{name:<28} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+              f"{result['peak_alloc_kb']:>14,.1f} {result['bytes']:>10,}")
+
+    report = {
+        'python': platform.python_version(),
+        'lessons': len(lessons),
+        'rounds': args.rounds,
+        'render_mode': args.render_mode,
+        'docx_engine': args.docx_engine,
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        'cases': cases
+    }
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(cases, baseline, args.threshold)
+        if not regressions:
+            print(f"No regressions against {args.compare} (threshold {args.threshold:.0%})")
+            return 0
+        print(f"Regressions against {args.compare} (threshold {args.threshold:.0%}):")
+        for name, metric, old, new in regressions:
+            print(f"  {name} {metric}: {old} -> {new} ({new / old - 1:+.1%})")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+ZIP Compression Benchmark
+Compares package_files compression policies: bytes saved against CPU time per package
+
+Usage: python benchmarks/compression.py [--rounds 20] [--policies fast,deflate]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lesson_generator import LessonPlanGenerator, COMPRESSION_POLICIES
+
+SAMPLE_LESSONS = [
+    {'subject': 'Physics', 'topic': 'Simple Harmonic Motion', 'period': '2', 'gifted_talented': True,
+     'ppt_style': '7E Model'},
+    {'subject': 'Biology', 'topic': 'Cell Division and the Cell Cycle', 'period': '1',
+     'gifted_talented': False, 'ppt_style': '7E Model'},
+    {'subject': 'Math', 'topic': 'Quadratic Functions', 'period': '3', 'gifted_talented': True,
+     'ppt_style': '7E Model'},
+]
+
+
+def sample_lesson(overrides):
+    lesson_data = {
+        'date': '2025-10-12', 'semester': '1', 'grade': '10', 'standards': [],
+        'digital_platform': 'PhET', 'value': 'Respect/Integrity'
+    }
+    lesson_data.update(overrides)
+    return lesson_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20, help='packages built per policy and lesson')
+    parser.add_argument('--policies', default=','.join(COMPRESSION_POLICIES),
+                        help='comma separated policy names')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        generator = LessonPlanGenerator(render_mode='serial')
+        generator.output_folder = workdir
+
+        # Render each lesson once; only packaging is measured
+        lessons = []
+        for overrides in SAMPLE_LESSONS:
+            lesson_data = sample_lesson(overrides)
+            ai_content = generator.generate_ai_content(lesson_data)
+            documents = generator.render_documents(lesson_data, ai_content)
+            lessons.append((lesson_data, list(documents.values())))
+        raw_bytes = sum(len(data) for _, documents in lessons for _, data in documents) / len(lessons)
+
+        print(f"{'policy':<10} {'bytes/pkg':>11} {'saved':>8} {'cpu ms/pkg':>11} {'pkgs/sec':>9}")
+        for policy in args.policies.split(','):
+            if policy not in COMPRESSION_POLICIES:
+                print(f"{policy:<10} not available on this Python")
+                continue
+            generator.compression_policy = policy
+
+            total_bytes = 0
+            cpu_started = time.process_time()
+            wall_started = time.perf_counter()
+            for _ in range(args.rounds):
+                for lesson_data, documents in lessons:
+                    zip_path = generator.package_files(lesson_data, documents)
+                    total_bytes += os.path.getsize(zip_path)
+                    os.remove(zip_path)
+            cpu = time.process_time() - cpu_started
+            wall = time.perf_counter() - wall_started
+
+            packages = args.rounds * len(lessons)
+            size = total_bytes / packages
+            print(f"{policy:<10} {size:>11,.0f} {1 - size / raw_bytes:>8.1%} "
+                  f"{cpu / packages * 1000:>11.2f} {packages / wall:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
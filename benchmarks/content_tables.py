@@ -0,0 +1,111 @@
+"""
+Structured Content Benchmark
+Measures time and memory allocated to build every _generate_section of a lesson, the
+fallback content every lesson uses when no AI client is configured
+
+Usage: python benchmarks/content_tables.py [--calls 2000] [--rounds 5] [--save result.json] [--compare result.json]
+
+Run it against two checkouts to compare implementations, e.g. save on the old revision
+and --compare on the new one.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lesson_generator import LessonPlanGenerator, AI_CONTENT_SECTIONS
+
+SUBJECTS = ('Physics', 'Chemistry', 'Biology', 'Math', 'Art')
+TOPICS = ('Waves', 'Cell Division', 'Chemical Bonding', 'Quadratic Functions')
+
+
+def lessons():
+    """Every subject / topic / gifted / platform combination"""
+    for subject, topic, gifted, platform in itertools.product(SUBJECTS, TOPICS, (False, True), ('PhET', '')):
+        yield {'subject': subject, 'topic': topic, 'grade': '10', 'gifted_talented': gifted,
+               'digital_platform': platform}
+
+
+def measure(generator, lesson_list, calls, rounds):
+    """Per-call time, retained allocations and transient peak of the structured content"""
+    plan = [lesson_list[i % len(lesson_list)] for i in range(calls)]
+
+    def build(lesson):
+        return {section: generator._generate_section(section, lesson) for section in AI_CONTENT_SECTIONS}
+
+    # Best of several rounds, which filters out scheduler noise on shared machines
+    elapsed = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for lesson in plan:
+            build(lesson)
+        duration = time.perf_counter() - started
+        elapsed = duration if elapsed is None else min(elapsed, duration)
+
+    # Keep every result alive so the snapshot difference is what each call allocated and returned
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [build(lesson) for lesson in plan]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    del results
+
+    # Largest working set of a single call, including temporaries it frees again
+    tracemalloc.start()
+    peak = 0
+    for lesson in lesson_list:
+        tracemalloc.reset_peak()
+        start_size = tracemalloc.get_traced_memory()[0]
+        build(lesson)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - start_size)
+    tracemalloc.stop()
+
+    return {
+        'us_per_call': round(elapsed / calls * 1e6, 2),
+        'blocks_per_call': round(blocks / calls, 1),
+        'bytes_per_call': round(size / calls),
+        'peak_bytes_per_call': peak
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=2000, help='calls per timed round')
+    parser.add_argument('--rounds', type=int, default=5, help='timed rounds; the fastest is reported')
+    parser.add_argument('--save', metavar='PATH', help='write the results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='show the change against saved results')
+    args = parser.parse_args()
+
+    generator = LessonPlanGenerator(render_mode='serial')
+    result = measure(generator, list(lessons()), args.calls, args.rounds)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print(f"{args.calls} calls over {len(list(lessons()))} lessons")
+    print(f"{'metric':<22} {'value':>12}" + (f" {'baseline':>12} {'change':>8}" if baseline else ''))
+    for metric, value in result.items():
+        line = f"{metric:<22} {value:>12,}"
+        if baseline and baseline.get(metric):
+            line += f" {baseline[metric]:>12,} {value / baseline[metric] - 1:>+8.1%}"
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved results to {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+Load Test
+Drives the app with recorded or synthetic traffic at a set concurrency and rate, and
+reports throughput, latency percentiles, error rates and job queue saturation
+
+Usage:
+  python benchmarks/loadtest.py [--requests 50] [--concurrency 4] [--rate 2]
+  python benchmarks/loadtest.py --url http://127.0.0.1:8000 --replay traffic.jsonl
+
+Without --url the app is imported and driven through Flask's test client. Record
+real traffic by starting the app with LESSON_RECORD_REQUESTS=traffic.jsonl; replayed
+downloads fetch packages generated during the replay, since recorded ids do not exist there.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import statistics
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SUBJECTS = ('Physics', 'Biology', 'Chemistry', 'Math')
+TOPICS = ('Simple Harmonic Motion', 'Cell Division', 'Chemical Bonding', 'Quadratic Functions',
+          'Electromagnetic Induction', 'Photosynthesis', 'Reaction Rates', 'Probability')
+
+# Synthetic request kinds and their default share of the traffic
+DEFAULT_MIX = 'generate=2,month=5,download=3'
+
+
+class TestClientTransport:
+    """Requests through Flask's test client, one client per thread"""
+
+    def __init__(self):
+        import app as application
+        self.app = application.app
+        self._local = threading.local()
+
+    def request(self, method, path, payload=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=payload)
+        return response.status_code, response.get_data()
+
+
+class HTTPTransport:
+    """Requests against a running server, e.g. a local gunicorn"""
+
+    def __init__(self, base_url, timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def synthetic_lesson(rng):
+    return {
+        'date': f"2025-{rng.choice([9, 10, 11, 12]):02d}-{rng.randint(1, 28):02d}",
+        'semester': str(rng.randint(1, 3)), 'grade': str(rng.randint(9, 12)),
+        'subject': rng.choice(SUBJECTS), 'topic': rng.choice(TOPICS),
+        'period': str(rng.randint(1, 3)), 'gifted_talented': rng.random() < 0.3,
+        'standards': rng.sample(['NGSS', 'AP', 'IB', 'Common Core'], 2),
+        'digital_platform': 'PhET', 'ppt_style': '7E Model'
+    }
+
+
+def synthetic_requests(count, mix, seed):
+    """A shuffled list of (method, path, payload) following the kind=weight mix"""
+    rng = random.Random(seed)
+    weights = {}
+    for part in mix.split(','):
+        kind, _, weight = part.partition('=')
+        weights[kind.strip()] = float(weight or 1)
+    kinds = rng.choices(list(weights), weights=list(weights.values()), k=count)
+
+    requests = []
+    for kind in kinds:
+        if kind == 'generate':
+            requests.append(('POST', '/api/generate-lesson-plan', synthetic_lesson(rng)))
+        elif kind == 'month':
+            requests.append(('POST', '/api/get-month-value', {'date': synthetic_lesson(rng)['date']}))
+        elif kind == 'download':
+            # Resolved at send time to a package produced earlier in the run
+            requests.append(('GET', '/api/download/', None))
+        else:
+            raise ValueError(f"Unknown request kind in mix: {kind}")
+    return requests
+
+
+def recorded_requests(path, count):
+    """(method, path, payload) entries from a LESSON_RECORD_REQUESTS log, repeated up to count"""
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            # CSV batch uploads are recorded without a JSON body and cannot be replayed
+            if entry['method'] == 'POST' and entry.get('json') is None:
+                continue
+            path = entry['path']
+            if kind_of(path) == 'download':
+                # Artifact ids belong to the recording run: download a package of this run instead
+                path = '/api/download/'
+            entries.append((entry['method'], path, entry.get('json')))
+    if not entries:
+        raise ValueError(f"No replayable requests in {path}")
+    count = count or len(entries)
+    return [entries[i % len(entries)] for i in range(count)]
+
+
+def kind_of(path):
+    if path.startswith('/api/generate'):
+        return 'generate'
+    if path.startswith('/api/download/'):
+        return 'download'
+    if path.startswith('/api/get-month-value'):
+        return 'month'
+    return path
+
+
+class LoadTest:
+    """Sends the planned requests from concurrent workers at an optional fixed rate"""
+
+    def __init__(self, transport, plan, concurrency, rate, job_timeout):
+        self.transport = transport
+        self.plan = plan
+        self.concurrency = concurrency
+        self.rate = rate
+        self.job_timeout = job_timeout
+
+        self._lock = threading.Lock()
+        self._next = 0
+        self.results = []
+        self.downloads = []
+        self.health = []
+        self._running = False
+
+    def run(self):
+        self._running = True
+        self.started = time.perf_counter()
+        monitor = threading.Thread(target=self._monitor, daemon=True)
+        monitor.start()
+        workers = [threading.Thread(target=self._worker) for _ in range(self.concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.elapsed = time.perf_counter() - self.started
+        self._running = False
+        monitor.join()
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                index = self._next
+                self._next += 1
+            if index >= len(self.plan):
+                return
+            if self.rate:
+                # Open-loop schedule: request i is due at i / rate seconds
+                delay = self.started + index / self.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            method, path, payload = self.plan[index]
+            self.results.append(self._send(method, path, payload))
+
+    def _send(self, method, path, payload):
+        kind = kind_of(path)
+        if kind == 'download' and path.endswith('/'):
+            with self._lock:
+                path = random.choice(self.downloads) if self.downloads else None
+            if path is None:
+                return {'kind': kind, 'ok': None, 'latency': 0.0, 'status': 'skipped'}
+
+        started = time.perf_counter()
+        try:
+            status, body = self.transport.request(method, path, payload)
+            ok = status < 400
+            if kind == 'generate' and status == 202:
+                status, ok = self._wait_for_job(json.loads(body))
+        except Exception as e:
+            status, ok = type(e).__name__, False
+        return {'kind': kind, 'ok': ok, 'latency': time.perf_counter() - started, 'status': status}
+
+    def _wait_for_job(self, queued):
+        deadline = time.perf_counter() + self.job_timeout
+        while time.perf_counter() < deadline:
+            _, body = self.transport.request('GET', queued['status_url'])
+            job = json.loads(body)
+            if job.get('status') == 'success':
+                with self._lock:
+                    self.downloads.append(job['download_url'])
+                return 'success', True
+            if job.get('status') == 'error':
+                return 'job_error', False
+            time.sleep(0.25)
+        return 'job_timeout', False
+
+    def _monitor(self):
+        while self._running:
+            try:
+                status, body = self.transport.request('GET', '/health')
+                if status == 200:
+                    self.health.append(json.loads(body).get('jobs', {}))
+            except Exception:
+                pass
+            time.sleep(0.5)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def report(test):
+    results = [result for result in test.results if result['ok'] is not None]
+    print(f"{len(results)} requests in {test.elapsed:.1f}s "
+          f"({len(results) / test.elapsed:.2f} req/s) at concurrency {test.concurrency}"
+          + (f", target rate {test.rate}/s" if test.rate else ''))
+    skipped = len(test.results) - len(results)
+    if skipped:
+        print(f"{skipped} downloads skipped (no package finished yet)")
+
+    print(f"{'kind':<10} {'count':>6} {'errors':>7} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'max s':>8}")
+    for kind in sorted({result['kind'] for result in results}):
+        latencies = [result['latency'] for result in results if result['kind'] == kind]
+        errors = sum(1 for result in results if result['kind'] == kind and not result['ok'])
+        print(f"{kind:<10} {len(latencies):>6} {errors / len(latencies):>7.1%} "
+              f"{statistics.median(latencies):>8.3f} {percentile(latencies, 0.95):>8.3f} "
+              f"{percentile(latencies, 0.99):>8.3f} {max(latencies):>8.3f}")
+
+    failures = {}
+    for result in results:
+        if not result['ok']:
+            failures[str(result['status'])] = failures.get(str(result['status']), 0) + 1
+    if failures:
+        print("Errors: " + ', '.join(f"{status} x{count}" for status, count in sorted(failures.items())))
+
+    if test.health:
+        workers = max(sample.get('workers', 1) for sample in test.health) or 1
+        busy = [sample.get('running', 0) / workers for sample in test.health]
+        queued = [sample.get('queued', 0) for sample in test.health]
+        print(f"Job workers: {workers}, mean busy {statistics.mean(busy):.0%}, "
+              f"peak queue {max(queued)}, mean queue {statistics.mean(queued):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='base URL of a running server (default: in-process test client)')
+    parser.add_argument('--replay', metavar='PATH', help='JSONL recorded with LESSON_RECORD_REQUESTS')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='synthetic kind=weight list (generate, month, download)')
+    parser.add_argument('--requests', type=int, help='requests to send (default 50, or the whole recording)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=0, help='requests per second, 0 for as fast as possible')
+    parser.add_argument('--job-timeout', type=float, default=300, help='seconds to wait for each generation job')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.replay:
+        plan = recorded_requests(args.replay, args.requests)
+    else:
+        plan = synthetic_requests(args.requests or 50, args.mix, args.seed)
+    transport = HTTPTransport(args.url) if args.url else TestClientTransport()
+
+    test = LoadTest(transport, plan, args.concurrency, args.rate, args.job_timeout)
+    test.run()
+    report(test)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Generation Caches
+Content-addressed caches so identical lesson requests reuse earlier work
+"""
+
+import os
+import json
+import time
+import hashlib
+import shutil
+import threading
+from collections import OrderedDict
+
+# lesson_data fields that change the generated content (date only picks the Value)
+CONTENT_FIELDS = ('semester', 'grade', 'subject', 'topic', 'period', 'standards',
+                  'digital_platform', 'gifted_talented', 'value')
+
+# A finished package also depends on the printed date and the slide style
+PACKAGE_FIELDS = CONTENT_FIELDS + ('date', 'ppt_style')
+
+
+def _normalize(value):
+    """Canonical form of a lesson_data value for hashing"""
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    if isinstance(value, (list, tuple)):
+        return sorted({_normalize(item) for item in value if item not in (None, '')})
+    if value is None:
+        return ''
+    return value
+
+
+def lesson_key(lesson_data, fields):
+    """Stable SHA-256 of the given lesson_data fields"""
+    canonical = {field: _normalize(lesson_data.get(field)) for field in fields}
+    if 'period' in canonical:
+        canonical['period'] = str(canonical['period'])
+    if 'gifted_talented' in canonical:
+        canonical['gifted_talented'] = bool(canonical['gifted_talented'])
+    payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def content_key(lesson_data):
+    """Cache key for generated ai_content"""
+    return lesson_key(lesson_data, CONTENT_FIELDS)
+
+
+def package_key(lesson_data, variant=''):
+    """Cache key for a finished ZIP package built with the given packaging variant"""
+    key = lesson_key(lesson_data, PACKAGE_FIELDS)
+    if variant:
+        key = hashlib.sha256(f"{key}:{variant}".encode('utf-8')).hexdigest()
+    return key
+
+
+class ContentCache:
+    """Two-tier cache of ai_content: in-memory LRU plus JSON files shared by all workers"""
+
+    def __init__(self, folder, max_entries=256, max_disk_entries=5000, ttl=7 * 24 * 3600):
+        self.folder = folder
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        os.makedirs(self.folder, exist_ok=True)
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return a private copy of the cached content, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored, payload = entry
+                if now - stored <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return json.loads(payload)
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            if now - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = f.read()
+            content = json.loads(payload)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, payload, now)
+        return content
+
+    def put(self, key, content):
+        """Store content in both tiers"""
+        payload = json.dumps(content)
+        now = time.time()
+        with self._lock:
+            self._remember(key, payload, now)
+            self._writes += 1
+            sweep = self._writes % 50 == 0
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write content cache entry: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        if sweep:
+            self._evict_disk()
+
+    def stats(self):
+        """Hit/miss counters for this worker"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._memory),
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': round(hits / lookups, 3) if lookups else 0.0
+            }
+
+    def _remember(self, key, payload, stored):
+        self._memory[key] = (stored, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """Drop expired entries and the oldest ones beyond max_disk_entries"""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.folder):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            if now - mtime > self.ttl:
+                self._remove(entry.path)
+            else:
+                entries.append((mtime, entry.path))
+
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_disk_entries)]:
+            self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+
+class PackageCache:
+    """Finished ZIP packages kept on disk, evicted least-recently-used past max_bytes"""
+
+    def __init__(self, folder, max_bytes=512 * 1024 * 1024, ttl=24 * 3600):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(self.folder, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, target_path):
+        """Link the cached package to target_path and return its manifest, or None"""
+        zip_path, manifest_path = self._paths(key)
+        try:
+            if time.time() - os.path.getmtime(zip_path) > self.ttl:
+                raise FileNotFoundError(zip_path)
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            _link_or_copy(zip_path, target_path)
+            os.utime(zip_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return manifest
+
+    def put(self, key, package_path, manifest):
+        """Keep a link to a freshly built package plus its manifest"""
+        zip_path, manifest_path = self._paths(key)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            _link_or_copy(package_path, zip_path + suffix)
+            with open(manifest_path + suffix, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            os.replace(manifest_path + suffix, manifest_path)
+            os.replace(zip_path + suffix, zip_path)
+        except OSError as e:
+            print(f"Could not cache package: {str(e)}")
+            for path in (zip_path + suffix, manifest_path + suffix):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+
+        self._evict()
+
+    def stats(self):
+        """Hit/miss counters for this worker"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+    def _evict(self):
+        """Drop expired packages, then the least recently used beyond max_bytes"""
+        now = time.time()
+        entries = []
+        total = 0
+        for entry in os.scandir(self.folder):
+            if not entry.name.endswith('.zip'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                self._remove(entry.path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, zip_path):
+        for path in (zip_path, zip_path[:-len('.zip')] + '.json'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _paths(self, key):
+        base = os.path.join(self.folder, key)
+        return base + '.zip', base + '.json'
+
+
+def _link_or_copy(source, target):
+    """Hard-link source to target, copying when the filesystem cannot link
+
+    A copy is written under a temporary name first so readers never see a partial file.
+    """
+    try:
+        os.link(source, target)
+    except OSError:
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, target)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,163 @@
+"""
+Content Tables
+Fixed text of the structured template content, built once at import time
+
+Sentences that mention the lesson topic are stored pre-split around {topic}, so a
+request only joins the topic into them (topic.join(parts)); everything else is shared
+as-is and lists are copied in one step.
+"""
+
+from types import MappingProxyType
+
+
+def topic_text(text):
+    """Split text around its {topic} placeholders; fill with topic.join(parts)"""
+    return tuple(text.split('{topic}'))
+
+
+def topic_list(texts):
+    """(texts, ((index, parts), ...)) so only the entries naming the topic are rebuilt"""
+    return tuple(texts), tuple((index, topic_text(text)) for index, text in enumerate(texts) if '{topic}' in text)
+
+
+def fill_list(entries, topic):
+    """New list of a topic_list() for one topic"""
+    texts, dynamic = entries
+    filled = list(texts)
+    for index, parts in dynamic:
+        filled[index] = topic.join(parts)
+    return filled
+
+
+# (text before the topic, between topic and subject, after the subject)
+OBJECTIVES = ("Students will analyze and evaluate ",
+              " through investigation, experimentation, and application of ",
+              " principles to real-world scenarios.")
+
+DIFFERENTIATED_OUTCOMES = MappingProxyType({
+    'assistance': topic_text("Identify and describe key characteristics of {topic} with support (DOK 1-2)"),
+    'average': topic_text("Analyze the relationship between variables in {topic} using data and graphs (DOK 2-3)"),
+    'upper': topic_text("Evaluate experimental results for {topic}, calculate errors, and justify findings by "
+                        "identifying systematic error sources (DOK 3-4)"),
+    'gifted': topic_text("Design and conduct an original investigation extending {topic} concepts to novel "
+                         "real-world applications with comprehensive analysis (DOK 4)"),
+})
+
+VOCABULARY = MappingProxyType({
+    'Physics': ('Amplitude', 'Period', 'Frequency', 'Wavelength', 'Velocity', 'Acceleration', 'Force', 'Energy'),
+    'Chemistry': ('Molecule', 'Atom', 'Reaction', 'Catalyst', 'Solution', 'Compound', 'Element', 'Bond'),
+    'Biology': ('Cell', 'Organism', 'Ecosystem', 'Evolution', 'Genetics', 'Metabolism', 'Homeostasis', 'Species'),
+    'Math': ('Variable', 'Equation', 'Function', 'Coefficient', 'Constant', 'Expression', 'Solution', 'Graph'),
+    'default': ('Concept', 'Process', 'Analysis', 'Evaluation', 'Application', 'Synthesis', 'Investigation',
+                'Conclusion')
+})
+
+RESOURCES = (
+    "Laptop/Tablet for each student or group",
+    "Calculator (scientific)",
+    "Whiteboard and markers",
+    "Student notebooks"
+)
+
+STARTER_ACTIVITY = topic_text(
+    "Real-world connection: Show a 30-second video or image demonstrating {topic} in everyday life "
+    "(e.g., playground swings, car suspension, building design). Students observe and note 3 things they notice.")
+STARTER_QUESTION = topic_text(
+    "How do you think understanding {topic} helps engineers design safer, more efficient systems in our daily lives?")
+
+TEACHING_STEPS = topic_list((
+    "1. Introduce key concept of {topic}",
+    "2. Define independent and dependent variables",
+    "3. Demonstrate the relationship using platform/simulation",
+    "4. Model data collection process",
+    "5. Show how to organize data in tables",
+    "6. Demonstrate graphing techniques",
+    "7. Guide students in identifying patterns"
+))
+
+# Per ability level: (level, opening words, activity, questions, VAK), opening words and VAK
+# given as (cooperative, independent)
+_TASK_LEVELS = (
+    ('assistance',
+     ("In groups,", "Individually,"),
+     "{lead} students will identify and measure basic characteristics of {topic} using guided worksheets with "
+     "step-by-step instructions and visual aids.",
+     ("1. What are the main parts/components of {topic}? (DOK 1)",
+      "2. How do you measure [key variable] in this setup? (DOK 1)",
+      "3. Record your measurements in the provided table. (DOK 1)",
+      "4. Describe what happens when you change [one variable]. (DOK 2)",
+      "5. Which setup showed the [largest/smallest] value? Why? (DOK 2)"),
+     ('Visual (diagrams, charts), Kinesthetic (hands-on measurement), Auditory (group discussion)',
+      'Visual (worksheets), Kinesthetic (measurements), Auditory (self-explanation)')),
+    ('average',
+     ("Groups", "Students"),
+     "{lead} will conduct systematic investigations of {topic}, collect data across multiple trials, create graphs, "
+     "and analyze relationships between variables.",
+     ("1. What pattern do you observe in your data for {topic}? (DOK 2)",
+      "2. Create a graph showing the relationship between [variable A] and [variable B]. (DOK 2)",
+      "3. Explain why the relationship follows this pattern. (DOK 3)",
+      "4. What factors might affect the accuracy of your results? (DOK 3)",
+      "5. Predict what would happen if you doubled [one variable]. Test your prediction. (DOK 3)"),
+     ('Visual (graphs, data visualization), Kinesthetic (experimentation), Auditory (explanation and discussion)',
+      'Visual (data analysis), Kinesthetic (investigation), Auditory (verbal reasoning)')),
+    ('upper',
+     ("Collaborative teams", "Students independently"),
+     "{lead} will design comprehensive investigations, conduct error analysis, evaluate theoretical vs. "
+     "experimental results, and justify discrepancies through systematic error identification.",
+     ("1. Design an investigation to determine the mathematical relationship in {topic}. (DOK 3)",
+      "2. Analyze your graph's slope and calculate its theoretical value. Compare and explain any differences. (DOK 3)",
+      "3. Calculate the percentage error between your results and theoretical predictions. (DOK 3)",
+      "4. Evaluate your experimental method: What systematic errors exist? How do they affect results? (DOK 4)",
+      "5. Propose improvements to reduce errors and justify why your modifications would work. (DOK 4)"),
+     ('Visual (complex graphs, error bars), Kinesthetic (precise measurements), Auditory (justification and evaluation)',
+      'Visual (detailed analysis), Kinesthetic (refined experimentation), Auditory (critical reasoning)')),
+    ('gifted',
+     ("Advanced research teams", "Individual advanced investigation:"),
+     "{lead} Design and conduct an original research project extending {topic} to real-world applications. "
+     "Develop novel experimental setups, conduct comprehensive error analysis, and present findings with "
+     "professional-level documentation.",
+     ("1. Design an original investigation applying {topic} principles to solve a real-world engineering problem. (DOK 4)",
+      "2. Synthesize data from multiple trials using statistical analysis (mean, standard deviation, confidence intervals). (DOK 4)",
+      "3. Evaluate competing theoretical models and determine which best explains your empirical findings. (DOK 4)",
+      "4. Create a research proposal for extending this investigation, including hypothesis, methodology, and predicted outcomes. (DOK 4)",
+      "5. Defend your conclusions: How would you respond to a scientist who challenges your error analysis? (DOK 4)"),
+     ('Visual (professional graphs, presentations), Kinesthetic (advanced experimentation), Auditory (research defense)',
+      'Visual (research documentation), Kinesthetic (novel experimental design), Auditory (critical evaluation)')),
+)
+
+# task type: ((level, activity, questions, vak), ...) with the wording for that task type resolved
+DIFFERENTIATED_TASKS = MappingProxyType({
+    task_type: tuple(
+        (level, topic_text(activity.replace('{lead}', leads[position])),
+         topic_list(questions), vak[position])
+        for level, leads, activity, questions, vak in _TASK_LEVELS
+    )
+    for position, task_type in enumerate(('cooperative', 'independent'))
+})
+
+PLENARY_ACTIVITY = topic_text("Class discussion connecting {topic} to real-world applications")
+PLENARY_CONNECTION = topic_text(
+    "Discuss how understanding {topic} is crucial in modern technology, engineering, and daily life. Show "
+    "examples from UAE infrastructure, renewable energy projects, or cutting-edge technology.")
+PLENARY_QUESTIONS = topic_list((
+    "What was the most surprising thing you learned about {topic} today?",
+    "How could you apply this knowledge to solve a problem in your community?",
+    "What questions do you still have that you'd like to investigate further?"
+))
+PLENARY_FORWARD = topic_text(
+    "Next lesson, we'll explore how {topic} connects to [related advanced concept], building on today's foundations.")
+
+ADEK_MY_IDENTITY = ("Relate the scientific principles to UAE's innovation and technological advancement, showing how "
+                    "understanding these concepts contributes to national development and global competitiveness.")
+ADEK_MORAL_EDUCATION = ("Discuss the importance of honesty in scientific reporting, integrity in data collection, and "
+                        "perseverance when experiments don't yield expected results.")
+ADEK_SCIENCE = topic_text("Investigate {topic} through experimentation and observation")
+ADEK_TECHNOLOGY = "Use digital tools for data collection and analysis"
+ADEK_ENGINEERING = "Apply concepts to solve real-world engineering challenges"
+ADEK_ART = "Create visual representations (graphs, diagrams) to communicate findings"
+ADEK_MATH = "Use mathematical formulas, graphing, and statistical analysis"
+ADEK_LINKS = ("Mathematics (graphing, equations), ICT (digital simulations), Engineering (design thinking), "
+              "Art (visual communication)")
+ADEK_ENVIRONMENT = "Discuss how scientific understanding helps develop sustainable technologies and protect our environment"
+
+SKILLS = ("Critical Thinking", "Collaboration", "Digital Literacy", "Problem Solving")
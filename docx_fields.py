@@ -0,0 +1,106 @@
+"""
+Word Template Fields
+Indexes placeholder locations in a template once and fills them without losing run formatting
+"""
+
+import re
+from docx.oxml.ns import qn
+
+# Parts of a .docx that can hold template fields
+FIELD_PART_TYPES = (
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.header+xml',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.footer+xml',
+)
+
+
+def _field_parts(document):
+    """Body, header and footer parts of a document keyed by part name"""
+    return {
+        str(part.partname): part
+        for part in document.part.package.iter_parts()
+        if part.content_type in FIELD_PART_TYPES
+    }
+
+
+def _paragraph_texts(paragraph):
+    """w:t elements belonging to this paragraph (not to paragraphs nested in text boxes)"""
+    return [t for t in paragraph.iter(qn('w:t'))
+            if next(t.iterancestors(qn('w:p')), None) is paragraph]
+
+
+def _element_path(element, root):
+    """Child indexes leading from root down to element"""
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return tuple(reversed(path))
+
+
+def build_placeholder_index(document, placeholders):
+    """Locate every paragraph that contains one of the placeholders
+
+    Covers the body, tables at any nesting depth, headers and footers. The
+    index records part names and element paths, so it can be applied to any
+    copy parsed from the same template bytes.
+    """
+    pattern = re.compile('|'.join(re.escape(p) for p in sorted(placeholders, key=len, reverse=True)))
+    index = []
+    for partname, part in _field_parts(document).items():
+        root = part.element
+        for paragraph in root.iter(qn('w:p')):
+            text = ''.join(t.text or '' for t in _paragraph_texts(paragraph))
+            found = sorted({match.group(0) for match in pattern.finditer(text)})
+            if found:
+                index.append((partname, _element_path(paragraph, root), tuple(found)))
+    return {'placeholders': tuple(placeholders), 'pattern': pattern, 'locations': index}
+
+
+def fill_placeholders(document, index, replacements):
+    """Replace indexed placeholders in a fresh copy of the template
+
+    Text is rewritten inside the existing w:t elements: the replacement lands
+    in the run where the placeholder starts, so its formatting is kept even
+    when Word split the placeholder across several runs.
+    """
+    parts = _field_parts(document)
+    pattern = index['pattern']
+    for partname, path, _ in index['locations']:
+        paragraph = parts[partname].element
+        for position in path:
+            paragraph = paragraph[position]
+        _replace_in_paragraph(paragraph, pattern, replacements)
+
+
+def _text_offsets(texts):
+    """Start offset of every w:t within the paragraph text"""
+    offsets = []
+    position = 0
+    for t in texts:
+        offsets.append(position)
+        position += len(t.text or '')
+    return offsets
+
+
+def _replace_in_paragraph(paragraph, pattern, replacements):
+    texts = _paragraph_texts(paragraph)
+    full_text = ''.join(t.text or '' for t in texts)
+
+    # Work backwards so the offsets of earlier matches stay valid
+    for match in reversed(list(pattern.finditer(full_text))):
+        value = replacements.get(match.group(0))
+        if value is None:
+            continue
+        start, end = match.span()
+        for t, t_start in zip(texts, _text_offsets(texts)):
+            text = t.text or ''
+            t_end = t_start + len(text)
+            if t_end <= start or t_start >= end:
+                continue
+            before = text[:max(0, start - t_start)]
+            after = text[end - t_start:] if end < t_end else ''
+            inserted = value if t_start <= start else ''
+            t.text = before + inserted + after
+            t.set(qn('xml:space'), 'preserve')
@@ -0,0 +1,112 @@
+"""
+DOK Classifier
+Assigns Webb's Depth of Knowledge level (1-4) to questions, from an explicit "(DOK n)"
+tag when the question carries one and otherwise from the verbs it uses
+"""
+
+import re
+from bisect import bisect_right
+
+DOK_LEVELS = {
+    1: 'DOK Level 1 (Recall & Reproduction)',
+    2: 'DOK Level 2 (Skills & Concepts)',
+    3: 'DOK Level 3 (Strategic Thinking)',
+    4: 'DOK Level 4 (Extended Thinking)'
+}
+
+# Level used when a question has neither a tag nor a known verb
+DEFAULT_LEVEL = 2
+
+# Verb lexicons per language: {language: {level: words}} (Webb's DOK wheel / Bloom verbs).
+# Words are matched case-insensitively as whole words; add a language by adding its
+# lexicon here and passing its code to DOKClassifier(languages=...).
+LEXICONS = {
+    'en': {
+        1: ('recall', 'recognize', 'identify', 'define', 'list', 'name', 'label', 'state', 'match',
+            'measure', 'record', 'memorize', 'repeat', 'recite', 'calculate', 'arrange', 'tabulate'),
+        2: ('describe', 'explain', 'summarize', 'classify', 'categorize', 'organize', 'estimate',
+            'compare', 'contrast', 'interpret', 'infer', 'graph', 'predict', 'relate', 'observe',
+            'collect', 'distinguish', 'modify', 'show'),
+        3: ('analyze', 'analyse', 'assess', 'justify', 'evaluate', 'investigate', 'formulate',
+            'hypothesize', 'construct', 'revise', 'differentiate', 'critique', 'cite', 'conclude',
+            'verify'),
+        4: ('design', 'synthesize', 'create', 'prove', 'connect', 'propose', 'defend', 'research',
+            'extend', 'develop', 'invent', 'compose')
+    }
+}
+
+# "(DOK 3)", "(DOK 1-2)", "(dok 4)"; a range counts as its upper level
+TAG_PATTERN = r'\(\s*DOK\s*(?P<tag>[1-4])(?:\s*[-–]\s*(?P<tag_upper>[1-4]))?\s*\)'
+
+# Joins questions for a batch scan; no tag or verb pattern can match across it
+SEPARATOR = '\x00'
+
+
+def _inflections(word):
+    """The word plus its regular -s/-es/-ed/-ing forms as one regex alternative"""
+    if word.endswith('y') and len(word) > 2 and word[-2] not in 'aeiou':
+        stem = re.escape(word[:-1])
+        return f"{stem}(?:y|ies|ied|ying)"
+    if word.endswith('e'):
+        stem = re.escape(word[:-1])
+        return f"{stem}(?:e|es|ed|ing)"
+    return f"{re.escape(word)}(?:s|es|ed|ing)?"
+
+
+class DOKClassifier:
+    """One precompiled pattern covering the DOK tag and every lexicon verb
+
+    classify_batch() scans a whole list of questions with a single regex pass, which
+    keeps bulk imports of thousands of questions fast.
+    """
+
+    def __init__(self, languages=('en',), default_level=DEFAULT_LEVEL):
+        self.default_level = default_level
+        words = {level: set() for level in DOK_LEVELS}
+        for language in languages:
+            for level, lexicon in LEXICONS[language].items():
+                words[level].update(word.casefold() for word in lexicon)
+
+        # Longest words first so a longer word is never cut short by a shorter alternative
+        groups = [TAG_PATTERN]
+        for level in sorted(words):
+            alternatives = '|'.join(_inflections(word) for word in sorted(words[level], key=len, reverse=True))
+            groups.append(rf"\b(?P<verb{level}>{alternatives})\b")
+        self.pattern = re.compile('|'.join(groups), re.IGNORECASE)
+
+    def classify(self, question):
+        """DOK level (1-4) of one question"""
+        return self.classify_batch([question])[0]
+
+    def classify_batch(self, questions):
+        """DOK levels for a list of questions, in order"""
+        starts = []
+        position = 0
+        for question in questions:
+            starts.append(position)
+            position += len(question) + len(SEPARATOR)
+
+        tagged = [0] * len(questions)
+        verbs = [0] * len(questions)
+        for match in self.pattern.finditer(SEPARATOR.join(questions)):
+            index = bisect_right(starts, match.start()) - 1
+            if match.group('tag'):
+                level = int(match.group('tag_upper') or match.group('tag'))
+                tagged[index] = max(tagged[index], level)
+            else:
+                level = int(match.lastgroup[len('verb'):])
+                verbs[index] = max(verbs[index], level)
+
+        # An explicit tag wins; otherwise the most demanding verb decides
+        return [tag or verb or self.default_level for tag, verb in zip(tagged, verbs)]
+
+    def group_by_level(self, questions):
+        """{level: [questions]} for levels 1-4, keeping question order within a level"""
+        grouped = {level: [] for level in DOK_LEVELS}
+        for question, level in zip(questions, self.classify_batch(questions)):
+            grouped[level].append(question)
+        return grouped
+
+
+# Shared English classifier; the compiled pattern is safe to use from any thread
+classifier = DOKClassifier()
@@ -0,0 +1,192 @@
+"""
+Fast Word Writer
+Writes simple documents (headings, paragraphs, page breaks, plain tables) straight to
+WordprocessingML instead of building them through python-docx's object model
+"""
+
+import re
+import io
+import time
+import zlib
+import struct
+import zipfile
+import threading
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.shared import Emu
+
+# Style names used by the builders and their style ids in the default template
+STYLE_IDS = {
+    'Title': 'Title',
+    'List Number': 'ListNumber',
+    'Table Grid': 'TableGrid',
+}
+STYLE_IDS.update({f'Heading {level}': f'Heading{level}' for level in range(1, 10)})
+
+# Text width of the default template page (12240 twips less two 1800 margins), in EMU
+BLOCK_WIDTH = 5486400
+
+_skeleton = None
+_skeleton_lock = threading.Lock()
+
+
+class FastDocument:
+    """Subset of the python-docx Document API that renders to XML text
+
+    Supports add_heading, add_paragraph, add_page_break, add_table and save,
+    and produces the same word/document.xml python-docx would for those calls.
+    Every other part of the package is copied from a pre-compressed skeleton.
+    """
+
+    def __init__(self):
+        self._body = []
+
+    def add_heading(self, text='', level=1):
+        style = 'Title' if level == 0 else f'Heading {level}'
+        self.add_paragraph(text, style)
+
+    def add_paragraph(self, text='', style=None):
+        if style is None:
+            self._body.append(f'<w:p>{_run(text)}</w:p>' if text else '<w:p/>')
+        else:
+            style_xml = f'<w:pPr><w:pStyle w:val="{STYLE_IDS[style]}"/></w:pPr>'
+            self._body.append(f'<w:p>{style_xml}{_run(text)}</w:p>')
+
+    def add_page_break(self):
+        self._body.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+
+    def add_table(self, rows, cols):
+        table = FastTable(rows, cols)
+        self._body.append(table)
+        return table
+
+    def save(self, stream):
+        skeleton = _get_skeleton()
+        body = ''.join(item if isinstance(item, str) else item.xml() for item in self._body)
+        document_xml = skeleton['head'] + body.encode('utf-8') + skeleton['tail']
+        stream.write(_build_zip(skeleton['members'], document_xml))
+
+
+class FastTable:
+    """Table whose cells are set through rows[i].cells[j].text like python-docx"""
+
+    def __init__(self, rows, cols):
+        self.style = None
+        self.cols = cols
+        self.rows = [_Row(cols) for _ in range(rows)]
+
+    def xml(self):
+        width = Emu(BLOCK_WIDTH // self.cols).twips
+        style = f'<w:tblStyle w:val="{STYLE_IDS[self.style]}"/>' if self.style else ''
+        parts = [
+            f'<w:tbl><w:tblPr>{style}<w:tblW w:type="auto" w:w="0"/>'
+            '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+            'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr><w:tblGrid>',
+            f'<w:gridCol w:w="{width}"/>' * self.cols,
+            '</w:tblGrid>'
+        ]
+        cell_start = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>'
+        for row in self.rows:
+            parts.append('<w:tr>')
+            for cell in row.cells:
+                text = f'<w:p>{_run(cell.text)}</w:p>' if cell.text else '<w:p/>'
+                parts.append(f'{cell_start}{text}</w:tc>')
+            parts.append('</w:tr>')
+        parts.append('</w:tbl>')
+        return ''.join(parts)
+
+
+class _Row:
+    def __init__(self, cols):
+        self.cells = [_Cell() for _ in range(cols)]
+
+
+class _Cell:
+    def __init__(self):
+        self.text = ''
+
+
+def warm():
+    """Build the skeleton now, e.g. before gunicorn forks its workers"""
+    _get_skeleton()
+
+
+def _run(text):
+    """One w:r with tabs and line breaks split out the way python-docx does"""
+    if not text:
+        return ''
+    content = []
+    for piece in re.split(r'(\t|\r|\n)', text):
+        if piece == '\t':
+            content.append('<w:tab/>')
+        elif piece in ('\r', '\n'):
+            content.append('<w:br/>')
+        elif piece:
+            space = ' xml:space="preserve"' if piece != piece.strip() else ''
+            content.append(f'<w:t{space}>{escape(piece)}</w:t>')
+    return f'<w:r>{"".join(content)}</w:r>'
+
+
+def _get_skeleton():
+    """Parts of an empty python-docx document, compressed once per process"""
+    global _skeleton
+    with _skeleton_lock:
+        if _skeleton is None:
+            _skeleton = _build_skeleton()
+        return _skeleton
+
+
+def _build_skeleton():
+    buffer = io.BytesIO()
+    Document().save(buffer)
+    members = []
+    head = tail = None
+    with zipfile.ZipFile(buffer) as package:
+        for name in package.namelist():
+            data = package.read(name)
+            if name == 'word/document.xml':
+                # Split the empty body around the final w:sectPr
+                split = data.index(b'<w:sectPr')
+                head, tail = data[:split], data[split:]
+                body_start = head.index(b'<w:body>') + len(b'<w:body>')
+                head = head[:body_start]
+                members.append((name, None))
+            else:
+                members.append((name, _compress(data)))
+    return {'members': members, 'head': head, 'tail': tail}
+
+
+def _compress(data):
+    """(crc, compressed size, size, deflated bytes) for a ZIP member"""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    return zlib.crc32(data), len(deflated), len(data), deflated
+
+
+def _build_zip(members, document_xml):
+    """Assemble the .docx: pre-compressed skeleton parts plus the new document.xml"""
+    now = time.localtime()
+    dos_time = (now.tm_hour << 11) | (now.tm_min << 5) | (now.tm_sec // 2)
+    dos_date = ((now.tm_year - 1980) << 9) | (now.tm_mon << 5) | now.tm_mday
+
+    out = io.BytesIO()
+    central = []
+    for name, compressed in members:
+        crc, size, raw_size, data = compressed or _compress(document_xml)
+        encoded_name = name.encode('utf-8')
+        offset = out.tell()
+        out.write(struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, 0, 8, dos_time, dos_date,
+                              crc, size, raw_size, len(encoded_name), 0))
+        out.write(encoded_name)
+        out.write(data)
+        central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, 20, 20, 0, 8, dos_time, dos_date,
+                                   crc, size, raw_size, len(encoded_name), 0, 0, 0, 0, 0, offset)
+                       + encoded_name)
+
+    central_offset = out.tell()
+    for record in central:
+        out.write(record)
+    out.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(central), len(central),
+                          out.tell() - central_offset, central_offset, 0))
+    return out.getvalue()
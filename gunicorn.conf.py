@@ -0,0 +1,64 @@
+"""
+Gunicorn Configuration
+Loads the app once in the master (preload_app) so heavy imports, parsed templates and
+content tables are shared copy-on-write by every worker
+
+Usage: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import gc
+import os
+import glob
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threads keep a worker responsive while it streams job events to a browser
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('LESSON_PRELOAD', '1').lower() not in ('0', 'false', 'off', 'no')
+
+# Workers write metric snapshots here so /metrics adds up all of them, whichever answers
+os.environ.setdefault('LESSON_METRICS_DIR', os.path.join('output', 'metrics'))
+
+# Set in the master right before each fork and inherited by the new worker
+_fork_started = None
+
+
+def on_starting(server):
+    # Snapshots of an earlier server run would otherwise be added to this one's totals
+    for path in glob.glob(os.path.join(os.environ['LESSON_METRICS_DIR'], '*.json')):
+        os.remove(path)
+
+
+def when_ready(server):
+    if preload_app:
+        # Everything loaded so far lives as long as the process; moving it out of the
+        # collector's generations stops gc from writing to (and un-sharing) those pages
+        gc.freeze()
+        import app
+        server.log.info(f"Preloaded app in {app.STARTUP['total']:.2f}s")
+
+
+def pre_fork(server, worker):
+    global _fork_started
+    _fork_started = time.perf_counter()
+
+
+def post_fork(server, worker):
+    # Job pools, sweepers and the question writer start lazily in whichever process
+    # uses them, so nothing created in the master needs restarting here
+    worker.boot_started = _fork_started or time.perf_counter()
+
+
+def post_worker_init(worker):
+    import app
+    boot_seconds = time.perf_counter() - worker.boot_started
+    app.worker_started(boot_seconds)
+    worker.log.info(f"Worker {os.getpid()} ready in {boot_seconds:.3f}s")
+
+
+def worker_exit(server, worker):
+    # Keep the counts of a worker that is being replaced
+    from metrics import metrics
+    metrics.flush()
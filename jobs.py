@@ -0,0 +1,420 @@
+"""
+Background Job Queue
+Runs lesson plan generation on a bounded worker pool and tracks per-step progress
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+import traceback
+from functools import partial
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics, process_alive
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): identical requests are only coalesced within one process
+    fcntl = None
+
+# Steps reported by LessonPlanGenerator.generate_complete_package
+GENERATION_STEPS = [
+    'Generating AI content',
+    'Creating lesson plan document',
+    'Creating worksheets',
+    'Creating rubrics',
+    'Creating question bank',
+    'Creating PowerPoint',
+    'Packaging files'
+]
+
+FINISHED_STATES = ('success', 'error')
+
+EXECUTION_MODES = ('thread', 'async')
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+
+class JobManager:
+    """Bounded worker pool with job state shared between processes on disk
+
+    Each job is stored as <id>.json (status, steps, result) plus an append-only
+    <id>.events.jsonl event log. Progress only changes memory; a writer thread
+    appends new events and rewrites the small state file at most every
+    save_interval seconds, so other workers see progress with that much delay.
+
+    In 'thread' mode every job holds a pool thread from start to finish. In 'async'
+    mode jobs run as tasks on one event loop thread, max_workers of them at a time:
+    coroutine functions wait on the AI model without holding a thread, and plain
+    functions are run on the loop's default executor.
+    """
+
+    def __init__(self, state_folder, max_workers=2, max_pending=100, retention=3600, mode='thread',
+                 stale_after=900, save_interval=0.25):
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode: {mode}")
+        self.state_folder = state_folder
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.mode = mode
+        self.stale_after = stale_after
+        self.save_interval = save_interval
+        self.inflight_folder = os.path.join(self.state_folder, 'inflight')
+        os.makedirs(self.inflight_folder, exist_ok=True)
+
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # Signalled when a job changes; _dirty maps job id -> events not yet in its log
+        self._changed = threading.Condition(self._lock)
+        self._dirty = {}
+        self._writing = False
+        self._writer = None
+        self._executor = None
+        self._loop = None
+        self._loop_pid = None
+        self._slots = None
+        self.coalesced = 0
+
+    def submit(self, func, *args, steps=None, kind='lesson_plan', key=None):
+        """Queue func(*args, progress=...) and return the new job record
+
+        Jobs given a key are single-flight: while a job with the same key is queued
+        or running in any worker process, its record is returned (with
+        'coalesced': True) instead of starting another one.
+        """
+        steps = steps or GENERATION_STEPS
+
+        with self._lock, self._inflight_lock(key):
+            self._prune()
+            if key is not None:
+                job = self._inflight_job(key)
+                if job is not None:
+                    self.coalesced += 1
+                    metrics.inc('lesson_jobs_coalesced_total', kind=kind)
+                    return dict(job, coalesced=True)
+
+            pending = sum(1 for job in self._jobs.values() if job['status'] not in FINISHED_STATES)
+            if pending >= self.max_pending:
+                raise QueueFullError('Too many lesson plans are being generated, please try again shortly')
+
+            now = time.time()
+            job = {
+                'id': uuid.uuid4().hex,
+                'kind': kind,
+                'status': 'queued',
+                'message': 'Waiting for a free worker...',
+                'step': 0,
+                'total_steps': len(steps),
+                'steps': [{'name': name, 'status': 'pending'} for name in steps],
+                'created': now,
+                'updated': now,
+                'result': None,
+                'events': [],
+                'key': key
+            }
+            self._jobs[job['id']] = job
+            # Written now, so a status poll answered by another worker finds the job
+            self._save(job)
+            self._start_writer()
+            if key is not None:
+                self._write_atomic(self._pointer_path(key), json.dumps({'job_id': job['id'], 'pid': os.getpid()}))
+
+            if self.mode == 'async':
+                asyncio.run_coroutine_threadsafe(self._run_async(job['id'], func, args), self._get_loop())
+            else:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='lesson-job')
+                self._executor.submit(self._run, job['id'], func, args)
+            return dict(job)
+
+    def get(self, job_id):
+        """Return a snapshot of a job (without its events), looking on disk for jobs owned by other workers"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return json.loads(json.dumps(self._state(job)))
+        return self._load(job_id)
+
+    def events(self, job_id, after=0):
+        """(job state, events numbered after `after`), or (None, []) for an unknown job
+
+        Another worker's job is read from disk: its state first, then its event log,
+        which is always written ahead of the state.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return json.loads(json.dumps(self._state(job))), job['events'][after:]
+
+        job = self._load(job_id)
+        if job is None:
+            return None, []
+        events = []
+        try:
+            with open(self._events_path(job_id), 'r', encoding='utf-8') as f:
+                for number, line in enumerate(f, 1):
+                    if number <= after:
+                        continue
+                    if not line.endswith('\n'):
+                        # Still being appended
+                        break
+                    events.append(json.loads(line))
+        except OSError:
+            pass
+        return job, events
+
+    def flush(self):
+        """Block until every job change so far is on disk"""
+        with self._changed:
+            while self._dirty or self._writing:
+                self._changed.wait(0.05)
+
+    def stats(self):
+        """Queue statistics for the health endpoint"""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {
+            'mode': self.mode,
+            'workers': self.max_workers,
+            'queued': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'finished': counts.get('success', 0) + counts.get('error', 0),
+            'coalesced': self.coalesced
+        }
+
+    def _run(self, job_id, func, args):
+        self._update(job_id, status='running', message='Starting generation...')
+        started = time.perf_counter()
+        try:
+            result = func(*args, progress=self._progress_callback(job_id))
+        except Exception as e:
+            result = self._job_error(job_id, e)
+        self._finish(job_id, result, started)
+
+    async def _run_async(self, job_id, func, args):
+        async with self._slots:
+            self._update(job_id, status='running', message='Starting generation...')
+            started = time.perf_counter()
+            progress = self._progress_callback(job_id)
+            try:
+                if asyncio.iscoroutinefunction(func):
+                    result = await func(*args, progress=progress)
+                else:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(None, partial(func, *args, progress=progress))
+            except Exception as e:
+                result = self._job_error(job_id, e)
+            self._finish(job_id, result, started)
+
+    def _get_loop(self):
+        """Event loop thread for async mode, started lazily in the process that runs jobs"""
+        if self._loop is None or self._loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                # Created on the loop so it binds to it on every Python version
+                self._slots = asyncio.Semaphore(self.max_workers)
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name='lesson-job-loop', daemon=True).start()
+            ready.wait()
+            self._loop = loop
+            self._loop_pid = os.getpid()
+        return self._loop
+
+    def _progress_callback(self, job_id):
+        def progress(step, message, status='running', data=None):
+            self._progress(job_id, step, message, status, data)
+        return progress
+
+    def _job_error(self, job_id, error):
+        print(f"Error in job {job_id}: {str(error)}")
+        print(traceback.format_exc())
+        return {'status': 'error', 'message': str(error)}
+
+    def _finish(self, job_id, result, started):
+        if result.get('status') == 'success':
+            status, message = 'success', 'Lesson plan package generated successfully!'
+        else:
+            status, message = 'error', result.get('message', 'Generation failed')
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=status, message=message, result=result)
+            self._add_event(job, 'complete', status=status, message=message)
+            self._changed_job(job)
+        metrics.inc('lesson_jobs_total', kind=job['kind'], status=status)
+        metrics.observe('lesson_job_seconds', time.perf_counter() - started, kind=job['kind'])
+
+    def _progress(self, job_id, step, message, status, data=None):
+        with self._lock:
+            job = self._jobs[job_id]
+            steps = job['steps']
+            if status == 'section':
+                # A streamed piece of AI content; step 1 itself is still running
+                self._add_event(job, 'section', step=step, message=message, **(data or {}))
+            elif 1 <= step <= len(steps):
+                steps[step - 1]['status'] = status
+                if status == 'running':
+                    steps[step - 1]['started'] = time.time()
+                    job['step'] = max(job['step'], step)
+                elif 'started' in steps[step - 1]:
+                    steps[step - 1]['duration'] = round(time.time() - steps[step - 1]['started'], 3)
+                self._add_event(job, 'progress', step=step, total_steps=len(steps), status=status,
+                                message=message)
+            job['message'] = message
+            self._changed_job(job)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            self._changed_job(job)
+
+    def _add_event(self, job, kind, **fields):
+        """Append to the job's event log, numbered for Server-Sent Events resume"""
+        events = job['events']
+        event = {'id': len(events) + 1, 'type': kind, 'time': time.time()}
+        event.update(fields)
+        events.append(event)
+        self._dirty.setdefault(job['id'], []).append(event)
+
+    def _changed_job(self, job):
+        """Mark a job for the writer thread; called with the lock held"""
+        job['updated'] = time.time()
+        self._dirty.setdefault(job['id'], [])
+        self._changed.notify_all()
+
+    def _start_writer(self):
+        # Started lazily so it is created in the process that runs the jobs
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, name='lesson-job-writer', daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            with self._changed:
+                while not self._dirty:
+                    self._changed.wait()
+                dirty, self._dirty = self._dirty, {}
+                self._writing = True
+                # Serialized under the lock; the steps and result can change right after
+                changes = [(self._jobs[job_id], json.dumps(self._state(self._jobs[job_id])),
+                            [json.dumps(event) + '\n' for event in events],
+                            self._jobs[job_id]['status'] in FINISHED_STATES)
+                           for job_id, events in dirty.items() if job_id in self._jobs]
+            try:
+                for job, state, events, finished in changes:
+                    if events:
+                        with open(self._events_path(job['id']), 'a', encoding='utf-8') as f:
+                            f.writelines(events)
+                    self._write_atomic(self._state_path(job['id']), state)
+                    if finished and job.get('key') is not None:
+                        self._release_inflight(job)
+            except Exception as e:
+                print(f"Error saving job state: {str(e)}")
+            finally:
+                with self._changed:
+                    self._writing = False
+                    self._changed.notify_all()
+            # Later changes in the meantime are written together
+            time.sleep(self.save_interval)
+
+    def _state(self, job):
+        """A job's fields without its event log"""
+        return {field: value for field, value in job.items() if field != 'events'}
+
+    def _prune(self):
+        """Forget finished jobs older than the retention window"""
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job['status'] in FINISHED_STATES and job['updated'] < cutoff]:
+            del self._jobs[job_id]
+            self._remove(self._state_path(job_id))
+            self._remove(self._events_path(job_id))
+
+    @contextmanager
+    def _inflight_lock(self, key):
+        """Exclusive lock over the in-flight pointers, held across every worker process"""
+        if key is None or fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.inflight_folder, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _inflight_job(self, key):
+        """The unfinished job a key's pointer names, or None; stale pointers are removed"""
+        path = self._pointer_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                pointer = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        job = self._jobs.get(pointer['job_id']) or self._load(pointer['job_id'])
+        # Left behind by a worker that died, or a job that stopped making progress
+        if (job is None or job['status'] in FINISHED_STATES or not process_alive(pointer['pid'])
+                or time.time() - job['updated'] > self.stale_after):
+            print(f"Dropping stale in-flight job {pointer['job_id']}")
+            self._remove(path)
+            return None
+        return job
+
+    def _release_inflight(self, job):
+        with self._inflight_lock(job['key']):
+            path = self._pointer_path(job['key'])
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    owner = json.load(f).get('job_id')
+            except (OSError, ValueError):
+                return
+            if owner == job['id']:
+                self._remove(path)
+
+    def _pointer_path(self, key):
+        return os.path.join(self.inflight_folder, f"{key}.json")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _load(self, job_id):
+        try:
+            with open(self._state_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _state_path(self, job_id):
+        return os.path.join(self.state_folder, f"{job_id}.json")
+
+    def _events_path(self, job_id):
+        return os.path.join(self.state_folder, f"{job_id}.events.jsonl")
+
+    def _save(self, job):
+        """Write job state atomically so other workers can serve status polls"""
+        self._write_atomic(self._state_path(job['id']), json.dumps(self._state(job)))
+
+    def _write_atomic(self, path, text):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
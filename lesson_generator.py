@@ -4,76 +4,935 @@ Handles content generation, document creation, and packaging
 """
 
 import os
+import io
+import re
 import json
 from datetime import datetime
 from docx import Document
-from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from pptx import Presentation
-from pptx.util import Inches as PptInches, Pt as PptPt
+from pptx.util import Inches as PptInches
 import zipfile
-import anthropic
-from pathlib import Path
+import time
+import uuid
+import asyncio
+import threading
+import multiprocessing
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from cache import content_key, package_key
+from template_pool import TemplatePool
+from docx_fields import build_placeholder_index, fill_placeholders
+from ai_client import AIClientError
+from metrics import metrics
+from fast_docx import FastDocument
+import content_tables
+from content_tables import fill_list
+import dok
+from dok import DOK_LEVELS
+
+# Document builders run after AI content generation: (result key, method, step, label)
+DOCUMENT_BUILDERS = [
+    ('lesson_plan', 'create_lesson_plan_document', 2, "Creating lesson plan document"),
+    ('worksheets', 'create_worksheets', 3, "Creating worksheets"),
+    ('rubrics', 'create_rubrics', 4, "Creating rubrics"),
+    ('question_bank', 'create_question_bank', 5, "Creating question bank"),
+    ('powerpoint', 'create_powerpoint', 6, "Creating PowerPoint")
+]
+
+RENDER_MODES = ('thread', 'process', 'serial')
+
+# Builders whose documents fast_docx.FastDocument can write (LESSON_DOCX_ENGINE)
+FAST_DOCX_BUILDERS = ('worksheets', 'rubrics', 'question_bank')
+
+# Sections of ai_content in generation order, with the names shown while they stream in
+AI_CONTENT_SECTIONS = {
+    'objectives': "Objectives",
+    'differentiated_outcomes': "Differentiated outcomes",
+    'vocabulary': "Key vocabulary",
+    'resources': "Resources",
+    'starter': "Starter",
+    'teaching_component': "Teaching component",
+    'cooperative_tasks': "Cooperative tasks",
+    'independent_tasks': "Independent tasks",
+    'plenary': "Plenary",
+    'adek_integration': "UAE/ADEK integration",
+    'skills': "Skills"
+}
+
+# Slides per ppt_style after the title slide: (title, ai_content section or None, fixed text)
+SLIDE_STAGES = {
+    '7E Model': [
+        ('Elicit', 'starter', None),
+        ('Engage', None, 'Hook students with real-world connection'),
+        ('Explore', 'teaching_component', None),
+        ('Explain', None, 'Present key concepts and vocabulary'),
+        ('Elaborate', 'cooperative_tasks', None),
+        ('Evaluate', None, 'Assessment and checking understanding'),
+        ('Extend', 'plenary', None)
+    ],
+    'I Do We Do You Do': [
+        ('Learning Objectives', 'objectives', None),
+        ('Key Vocabulary', 'vocabulary', None),
+        ('I Do: Teacher Modelling', 'teaching_component', None),
+        ('We Do: Guided Practice', 'cooperative_tasks', None),
+        ('You Do: Independent Practice', 'independent_tasks', None),
+        ('Reflection', 'plenary', None)
+    ],
+    '5E Model': [
+        ('Engage', 'starter', None),
+        ('Explore', 'cooperative_tasks', None),
+        ('Explain', 'teaching_component', None),
+        ('Elaborate', 'independent_tasks', None),
+        ('Evaluate', 'plenary', None)
+    ],
+    'Traditional': [
+        ('Introduction', 'objectives', None),
+        ('Key Vocabulary', 'vocabulary', None),
+        ('Main Lesson', 'teaching_component', None),
+        ('Practice: Group Work', 'cooperative_tasks', None),
+        ('Practice: Independent Work', 'independent_tasks', None),
+        ('Summary', 'plenary', None)
+    ]
+}
+SLIDE_STAGES['I Do, We Do, You Do'] = SLIDE_STAGES['I Do We Do You Do']
+
+# Sections a batch generates once per subject and grade and shares with the unit's other lessons
+SHARED_SECTIONS = ('vocabulary', 'adek_integration')
+
+# STEAM links in adek_integration that name the lesson's topic or platform; re-filled per lesson when shared
+LESSON_STEAM_FIELDS = ('science', 'technology')
+
+# ai_content sections each builder reads; a builder starts once these have arrived
+BUILDER_SECTIONS = {
+    'lesson_plan': ('objectives', 'differentiated_outcomes', 'vocabulary'),
+    'worksheets': ('cooperative_tasks',),
+    'rubrics': (),
+    'question_bank': ('cooperative_tasks', 'independent_tasks'),
+    # Any section a slide style can show; _builder_sections narrows it to the chosen style
+    'powerpoint': tuple(section for section in AI_CONTENT_SECTIONS
+                        if any(stage[1] == section for stages in SLIDE_STAGES.values() for stage in stages))
+}
+
+# ZIP compression per package member: {extension or 'default': (compress_type, compresslevel)}
+# docx/pptx are ZIP archives already, so deflating a .docx again saves ~6% for a lot of CPU
+# and it is stored. A python-pptx .pptx still shrinks ~23% at level 1 for under a millisecond
+# (its slide layouts and masters repeat the same XML, which per-member compression cannot
+# share), so it is compressed on purpose.
+COMPRESSION_POLICIES = {
+    'store': {'default': (zipfile.ZIP_STORED, None)},
+    'fast': {'.docx': (zipfile.ZIP_STORED, None), '.pptx': (zipfile.ZIP_DEFLATED, 1),
+             'default': (zipfile.ZIP_DEFLATED, 1)},
+    'deflate': {'default': (zipfile.ZIP_DEFLATED, None)},
+    'max': {'default': (zipfile.ZIP_DEFLATED, 9)}
+}
+if hasattr(zipfile, 'ZIP_ZSTANDARD'):
+    # Python 3.14+; needs an unzip tool with Zstandard support on the teacher's machine
+    COMPRESSION_POLICIES['zstd'] = {'.docx': (zipfile.ZIP_STORED, None),
+                                    '.pptx': (zipfile.ZIP_ZSTANDARD, 3),
+                                    'default': (zipfile.ZIP_ZSTANDARD, 3)}
+
+# Field labels filled in on the school lesson plan template
+LESSON_PLAN_FIELDS = ('Date:', 'SEMESTER:', 'Grade:', 'Subject:', 'Topic:', 'Period:', 'Value:')
+
+
+# Generator of a render worker process, set once when the process starts
+_process_generator = None
+
+
+def _init_render_process(generator):
+    """Render process initializer: keep one generator, with parsed templates, for all its tasks"""
+    global _process_generator
+    _process_generator = generator
+    generator.warm_templates()
+
+
+def _run_builder(generator, method, lesson_data, ai_content):
+    """Run one document builder and time it (module level so process pools can pickle it)
+
+    Render processes get generator=None and use their own _process_generator.
+    """
+    generator = generator or _process_generator
+    started = time.perf_counter()
+    document = getattr(generator, method)(lesson_data, ai_content)
+    return document, round(time.perf_counter() - started, 4)
+
+
+def _subject_key(lesson_data):
+    """Subject and grade a lesson shares its unit-wide sections with"""
+    return ' '.join(str(lesson_data['subject']).split()).casefold(), str(lesson_data['grade']).strip()
+
+
+def _safe_name(text):
+    """Filename-safe form of a subject or topic (no spaces, slashes or other separators)"""
+    return re.sub(r'[^\w\-]+', '_', str(text)).strip('_') or 'lesson'
+
+
+def _unique_suffix():
+    """Timestamp plus a random token so concurrent jobs never share an output name"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def _default_ppt_master():
+    """Bytes of the default python-pptx presentation at 10 x 7.5 inches"""
+    prs = Presentation()
+    prs.slide_width = PptInches(10)
+    prs.slide_height = PptInches(7.5)
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+def _index_slide_layouts(prs):
+    """Positions of the title and title-and-content layouts, looked up once per master"""
+    names = [layout.name for layout in prs.slide_layouts]
+    return {
+        'title': names.index('Title Slide') if 'Title Slide' in names else 0,
+        'content': names.index('Title and Content') if 'Title and Content' in names else 1
+    }
+
 
 class LessonPlanGenerator:
-    def __init__(self):
+    def __init__(self, render_mode=None, render_workers=None, content_cache=None, package_cache=None,
+                 compression_policy=None, ai_client=None, docx_engine=None, storage=None, question_store=None):
         self.output_folder = 'output'
         self.template_folder = 'documents'
         os.makedirs(self.output_folder, exist_ok=True)
         
-        # Initialize AI client (using environment variable)
-        self.ai_client = None  # Will be initialized with API key
+        # Optional ai_client.AIClient; without one the structured template content is used
+        self.ai_client = ai_client
+        
+        # Document rendering pool: 'thread', 'process' (multi-core) or 'serial'
+        self.render_mode = render_mode or os.environ.get('LESSON_RENDER_MODE', 'thread')
+        if self.render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {self.render_mode}")
+        self.render_workers = render_workers or int(os.environ.get('LESSON_RENDER_WORKERS', len(DOCUMENT_BUILDERS)))
+        self._render_executor = None
+        self._render_lock = threading.Lock()
+        # Builder tasks one batch may have on the render pool at once
+        self.batch_render_tasks = max(1, int(os.environ.get('LESSON_BATCH_RENDER_TASKS', self.render_workers)))
+        
+        # How package_files compresses each document (see COMPRESSION_POLICIES)
+        self.compression_policy = compression_policy or os.environ.get('LESSON_ZIP_POLICY', 'fast')
+        if self.compression_policy not in COMPRESSION_POLICIES:
+            print(f"Unknown ZIP policy '{self.compression_policy}', using 'fast'")
+            self.compression_policy = 'fast'
+        
+        # Builders that write their .docx directly instead of through python-docx:
+        # 'fast' for all of FAST_DOCX_BUILDERS, or a comma separated list of them
+        self.fast_docx_builders = self._parse_docx_engine(
+            docx_engine or os.environ.get('LESSON_DOCX_ENGINE', 'python-docx'))
+        
+        # Pre-parsed copies of the school lesson plan template
+        self.template_pool_size = int(os.environ.get('LESSON_TEMPLATE_POOL_SIZE', 4))
+        self._create_template_pools()
+        
+        # Optional cache.ContentCache / cache.PackageCache shared by identical lesson requests
+        self.content_cache = content_cache
+        self.package_cache = package_cache
+        
+        # Optional storage.StorageManager that places, indexes and expires finished packages
+        self.storage = storage
+        
+        # Optional question_store.QuestionStore that keeps the questions of every lesson
+        self.question_store = question_store
     
-    def generate_complete_package(self, lesson_data):
-        """Generate complete lesson plan package"""
+    def generate_complete_package(self, lesson_data, progress=None):
+        """Generate complete lesson plan package
+
+        progress, if given, is called as progress(step, message, status) so a
+        background job can report which of the seven steps is running. While
+        AI content streams in it is also called with status 'section' and a
+        {'section', 'content'} dict for every finished section.
+        """
+        step = 0
+        timings = {}
         try:
-            print("Step 1: Generating AI content...")
-            ai_content = self.generate_ai_content(lesson_data)
+            if self.package_cache is not None:
+                cached = self._reuse_cached_package(lesson_data, progress)
+                if cached:
+                    return cached
             
-            print("Step 2: Creating lesson plan document...")
-            lesson_doc = self.create_lesson_plan_document(lesson_data, ai_content)
+            # Steps 1-6: builders only read ai_content, so each one starts
+            # as soon as the sections it needs have streamed in
+            step = 1
+            documents = self._generate_and_render(lesson_data, progress, timings)
             
-            print("Step 3: Creating worksheets...")
-            worksheets = self.create_worksheets(lesson_data, ai_content)
+            step = 7
+            return self._package_documents(lesson_data, documents, progress, timings)
+        
+        except Exception as e:
+            return self._package_error(e, step, progress)
+    
+    async def generate_complete_package_async(self, lesson_data, progress=None):
+        """generate_complete_package for the async execution mode
+
+        Runs on an event loop: the streamed AI answer is awaited, while document
+        builders, packaging and package cache I/O run in executors, so one process
+        can keep many generations waiting on the model at once.
+        """
+        loop = asyncio.get_running_loop()
+        step = 0
+        timings = {}
+        try:
+            if self.package_cache is not None:
+                cached = await loop.run_in_executor(None, self._reuse_cached_package, lesson_data, progress)
+                if cached:
+                    return cached
             
-            print("Step 4: Creating rubrics...")
-            rubrics = self.create_rubrics(lesson_data, ai_content)
+            step = 1
+            documents = await self._agenerate_and_render(lesson_data, progress, timings)
             
-            print("Step 5: Creating question bank...")
-            question_bank = self.create_question_bank(lesson_data, ai_content)
+            step = 7
+            return await loop.run_in_executor(None, self._package_documents, lesson_data, documents,
+                                              progress, timings)
+        
+        except Exception as e:
+            return self._package_error(e, step, progress)
+    
+    def _package_documents(self, lesson_data, documents, progress, timings):
+        """Step 7: zip and store the rendered documents and build the success result"""
+        self._report(progress, 7, "Packaging files...")
+        started = time.perf_counter()
+        zip_file = self.package_files(lesson_data, [
+            documents[name] for name, _, _, _ in DOCUMENT_BUILDERS
+        ])
+        download_id = self._store(zip_file)
+        timings['package'] = round(time.perf_counter() - started, 4)
+        self._report(progress, 7, "Package ready", 'done')
+        
+        # Documents only exist inside the package; report their member names
+        files = {name: documents[name][0] for name, _, _, _ in DOCUMENT_BUILDERS}
+        
+        if self.package_cache is not None:
+            self.package_cache.put(package_key(lesson_data, self.compression_policy), zip_file,
+                                   {'files': files})
+        
+        files = dict(files, package=zip_file)
+        self._record_metrics('lesson_plan', timings, documents, zip_file)
+        
+        return {
+            'status': 'success',
+            'files': files,
+            'download_url': f'/api/download/{download_id}',
+            'timings': timings
+        }
+    
+    def _package_error(self, error, step, progress):
+        """Log a failed package and build the error result"""
+        print(f"Error in generate_complete_package: {str(error)}")
+        import traceback
+        traceback.print_exc()
+        if step == 7:
+            metrics.inc('lesson_stage_errors_total', stage='package')
+        if step:
+            self._report(progress, step, f"Failed: {str(error)}", 'error')
+        return {
+            'status': 'error',
+            'message': str(error)
+        }
+    
+    def generate_batch_package(self, lessons, progress=None):
+        """Generate a whole unit of lessons into one ZIP with a folder per lesson
+
+        Steps reported: 1 = AI content for every lesson, 2..N+1 = one per
+        lesson, N+2 = packaging. Lessons with identical content inputs share
+        one generated content dict, lessons of one subject and grade share
+        SHARED_SECTIONS, and the builders of all lessons are streamed onto the
+        render pool a few at a time.
+        """
+        step = 0
+        timings = {}
+        try:
+            step = 1
+            self._report(progress, step, f"Generating AI content for {len(lessons)} lessons...")
+            started = time.perf_counter()
+            contents = self._generate_batch_content(lessons)
+            lesson_contents = [contents[content_key(lesson_data)] for lesson_data in lessons]
+            timings['ai_content'] = round(time.perf_counter() - started, 4)
+            self._report(progress, step, f"AI content ready ({len(contents)} unique lessons)", 'done')
+            
+            step = 2
+            started = time.perf_counter()
+            for lesson_data, ai_content in zip(lessons, lesson_contents):
+                self._collect_questions(lesson_data, ai_content)
+            rendered = self._render_batch(lessons, lesson_contents, progress)
+            timings['render'] = round(time.perf_counter() - started, 4)
             
-            print("Step 6: Creating PowerPoint...")
-            ppt_file = self.create_powerpoint(lesson_data, ai_content)
+            step = len(lessons) + 2
+            self._report(progress, step, "Packaging files...")
+            started = time.perf_counter()
+            members = []
+            manifest = {'generated': datetime.now().isoformat(timespec='seconds'), 'lessons': []}
+            for number, (lesson_data, documents) in enumerate(zip(lessons, rendered), 1):
+                folder = _safe_name(f"{number:02d}_{lesson_data['subject']}_{lesson_data['topic']}")
+                files = [documents[name] for name, _, _, _ in DOCUMENT_BUILDERS]
+                members.extend((f"{folder}/{filename}", data) for filename, data in files)
+                manifest['lessons'].append({
+                    'folder': folder,
+                    'lesson': lesson_data,
+                    'files': [filename for filename, _ in files]
+                })
+            members.append(('manifest.json', json.dumps(manifest, indent=2).encode('utf-8')))
             
-            print("Step 7: Packaging files...")
-            zip_file = self.package_files(lesson_data, [
-                lesson_doc, worksheets, rubrics, question_bank, ppt_file
-            ])
+            zip_path = self._output_path(
+                f"LessonPlanBatch_{_safe_name(lessons[0]['subject'])}_{len(lessons)}_lessons_{_unique_suffix()}.zip")
+            self._write_zip(zip_path, members)
+            download_id = self._store(zip_path)
+            timings['package'] = round(time.perf_counter() - started, 4)
+            self._report(progress, step, "Package ready", 'done')
+            self._record_metrics('batch', timings, {}, zip_path)
             
             return {
                 'status': 'success',
                 'files': {
-                    'lesson_plan': lesson_doc,
-                    'worksheets': worksheets,
-                    'rubrics': rubrics,
-                    'question_bank': question_bank,
-                    'powerpoint': ppt_file,
-                    'package': zip_file
+                    'lessons': [lesson['folder'] for lesson in manifest['lessons']],
+                    'package': zip_path
                 },
-                'download_url': f'/api/download/{os.path.basename(zip_file)}'
+                'download_url': f'/api/download/{download_id}',
+                'timings': timings
             }
         
         except Exception as e:
-            print(f"Error in generate_complete_package: {str(e)}")
+            print(f"Error in generate_batch_package: {str(e)}")
             import traceback
             traceback.print_exc()
+            if step == len(lessons) + 2:
+                metrics.inc('lesson_stage_errors_total', stage='package')
+            # _render_batch reports a render failure against the failing lesson's own step
+            if step and step != 2:
+                self._report(progress, step, f"Failed: {str(e)}", 'error')
             return {
                 'status': 'error',
                 'message': str(e)
             }
     
-    def generate_ai_content(self, lesson_data):
-        """Generate comprehensive lesson content using AI"""
+    def _generate_batch_content(self, lessons):
+        """{content key: ai_content} for the distinct lessons of a batch
+
+        Lessons are generated in parallel, up to the AI client's concurrency.
+        Only the first lesson of each subject and grade asks for SHARED_SECTIONS;
+        the others reuse its vocabulary and ADEK integration, with the STEAM
+        links that depend on the lesson filled in for their own topic.
+        """
+        unique = {}
+        leaders = {}
+        for lesson_data in lessons:
+            key = content_key(lesson_data)
+            if key not in unique:
+                unique[key] = lesson_data
+                leaders.setdefault(_subject_key(lesson_data), key)
+        
+        def generate(key):
+            lesson_data = unique[key]
+            shared = () if leaders[_subject_key(lesson_data)] == key else SHARED_SECTIONS
+            return self.generate_ai_content(lesson_data, shared)
+        
+        workers = min(len(unique), self.ai_client.max_concurrency if self.ai_client else 1)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='lesson-batch-ai') as executor:
+            contents = dict(zip(unique, executor.map(generate, unique)))
+        
+        for key, lesson_data in unique.items():
+            leader_key = leaders[_subject_key(lesson_data)]
+            if key == leader_key:
+                continue
+            leader = contents[leader_key]
+            contents[key]['vocabulary'] = leader['vocabulary']
+            contents[key]['adek_integration'] = self._shared_adek_integration(leader['adek_integration'],
+                                                                             lesson_data)
+        return contents
+    
+    def _shared_adek_integration(self, shared, lesson_data):
+        """Another lesson's ADEK integration with the topic and platform STEAM links of this lesson"""
+        own = self._generate_adek_integration(lesson_data)['steam']
+        steam = dict(shared.get('steam') or {})
+        steam.update((field, own[field]) for field in LESSON_STEAM_FIELDS)
+        return dict(shared, steam=steam)
+    
+    def _render_batch(self, lessons, lesson_contents, progress):
+        """Render every document of every lesson, reporting one step per lesson
+
+        A failure is reported against the step of the lesson whose document
+        failed, then re-raised.
+        """
+        labels = [f"Lesson {number}: {lesson_data['topic']}" for number, lesson_data in enumerate(lessons, 1)]
+        rendered = [{} for _ in lessons]
+        failed = 0
+        
+        if self.render_mode == 'serial':
+            try:
+                for index, (lesson_data, ai_content) in enumerate(zip(lessons, lesson_contents)):
+                    failed = index
+                    self._report(progress, index + 2, f"Rendering {labels[index]}...")
+                    rendered[index] = self.render_documents(lesson_data, ai_content)
+                    self._report(progress, index + 2, f"{labels[index]} done", 'done')
+            except Exception as e:
+                self._report(progress, failed + 2, f"{labels[failed]} failed: {str(e)}", 'error')
+                raise
+            return rendered
+        
+        # The render pool is shared with single-lesson jobs: keep at most batch_render_tasks
+        # builders queued so their tasks never wait behind a whole unit
+        executor = self._get_render_executor()
+        tasks = iter([(index, name, method) for index in range(len(lessons))
+                      for name, method, _, _ in DOCUMENT_BUILDERS])
+        futures = {}
+        
+        def submit_next():
+            task = next(tasks, None)
+            if task is None:
+                return
+            index, name, method = task
+            if name == DOCUMENT_BUILDERS[0][0]:
+                self._report(progress, index + 2, f"Rendering {labels[index]}...")
+            future = executor.submit(_run_builder, self._task_generator(), method, lessons[index],
+                                     lesson_contents[index])
+            futures[future] = (index, name)
+        
+        try:
+            for _ in range(self.batch_render_tasks):
+                submit_next()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, name = futures.pop(future)
+                    failed = index
+                    rendered[index][name], _ = self._builder_result(future, name)
+                    if len(rendered[index]) == len(DOCUMENT_BUILDERS):
+                        self._report(progress, index + 2, f"{labels[index]} done", 'done')
+                    submit_next()
+        except Exception as e:
+            for future in futures:
+                future.cancel()
+            self._report(progress, failed + 2, f"{labels[failed]} failed: {str(e)}", 'error')
+            raise
+        
+        return rendered
+    
+    def _generate_and_render(self, lesson_data, progress, timings):
+        """Stream AI content (step 1) and render the five documents (steps 2-6)"""
+        self._report(progress, 1, "Generating AI content...")
+        started = time.perf_counter()
+        ai_content = {}
+        
+        if self.render_mode == 'serial':
+            for section, content in self.iter_ai_content(lesson_data):
+                ai_content[section] = content
+                self._report_section(progress, section, content)
+            timings['ai_content'] = round(time.perf_counter() - started, 4)
+            self._report(progress, 1, "AI content ready", 'done')
+            self._collect_questions(lesson_data, ai_content)
+            return self.render_documents(lesson_data, ai_content, progress, timings)
+        
+        executor = self._get_render_executor()
+        waiting = list(DOCUMENT_BUILDERS)
+        futures = {}
+        
+        def submit_ready_builders():
+            for builder in list(waiting):
+                name, method, step, label = builder
+                if all(section in ai_content for section in self._builder_sections(name, lesson_data)):
+                    waiting.remove(builder)
+                    self._report(progress, step, f"{label}...")
+                    future = executor.submit(_run_builder, self._task_generator(), method, lesson_data, dict(ai_content))
+                    futures[future] = (name, step, label)
+        
+        documents = {}
+        try:
+            submit_ready_builders()
+            for section, content in self.iter_ai_content(lesson_data):
+                ai_content[section] = content
+                self._report_section(progress, section, content)
+                submit_ready_builders()
+            timings['ai_content'] = round(time.perf_counter() - started, 4)
+            self._report(progress, 1, "AI content ready", 'done')
+            self._collect_questions(lesson_data, ai_content)
+            
+            for future in as_completed(futures):
+                name, step, label = futures[future]
+                documents[name], timings[name] = self._builder_result(future, name)
+                self._report(progress, step, f"{label} done", 'done')
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        
+        return documents
+    
+    async def _agenerate_and_render(self, lesson_data, progress, timings):
+        """Async version of _generate_and_render: builders run in executors as sections arrive"""
+        loop = asyncio.get_running_loop()
+        self._report(progress, 1, "Generating AI content...")
+        started = time.perf_counter()
+        ai_content = {}
+        
+        # Serial mode renders on the loop's default executor once all content is in
+        executor = None if self.render_mode == 'serial' else self._get_render_executor()
+        waiting = list(DOCUMENT_BUILDERS)
+        futures = {}
+        
+        def submit_ready_builders():
+            if executor is None:
+                return
+            for builder in list(waiting):
+                name, method, step, label = builder
+                if all(section in ai_content for section in self._builder_sections(name, lesson_data)):
+                    waiting.remove(builder)
+                    self._report(progress, step, f"{label}...")
+                    future = loop.run_in_executor(executor, _run_builder, self._task_generator(), method, lesson_data,
+                                                  dict(ai_content))
+                    futures[future] = (name, step, label)
+        
+        documents = {}
+        try:
+            submit_ready_builders()
+            async for section, content in self.aiter_ai_content(lesson_data):
+                ai_content[section] = content
+                self._report_section(progress, section, content)
+                submit_ready_builders()
+            timings['ai_content'] = round(time.perf_counter() - started, 4)
+            self._report(progress, 1, "AI content ready", 'done')
+            await loop.run_in_executor(None, self._collect_questions, lesson_data, ai_content)
+            
+            if executor is None:
+                return await loop.run_in_executor(None, self.render_documents, lesson_data, ai_content,
+                                                  progress, timings)
+            
+            pending = set(futures)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    name, step, label = futures[future]
+                    documents[name], timings[name] = self._builder_result(future, name)
+                    self._report(progress, step, f"{label} done", 'done')
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        
+        return documents
+    
+    def _collect_questions(self, lesson_data, ai_content):
+        """Queue the lesson's questions for the question store (written in the background)"""
+        if self.question_store is None:
+            return
+        try:
+            self.question_store.add_lesson(lesson_data, ai_content)
+        except Exception as e:
+            print(f"Could not queue questions for the question store: {str(e)}")
+    
+    def _builder_sections(self, name, lesson_data):
+        """ai_content sections a builder needs for this lesson"""
+        if name == 'powerpoint':
+            stages = SLIDE_STAGES.get(lesson_data.get('ppt_style', '7E Model'), SLIDE_STAGES['Traditional'])
+            return [section for _, section, _ in stages if section]
+        return BUILDER_SECTIONS[name]
+    
+    def _reuse_cached_package(self, lesson_data, progress):
+        """Serve an identical earlier request from the package cache"""
+        started = time.perf_counter()
+        zip_path = self._output_path(self._package_filename(lesson_data))
+        manifest = self.package_cache.get(package_key(lesson_data, self.compression_policy), zip_path)
+        if manifest is None:
+            return None
+        download_id = self._store(zip_path)
+        
+        print(f"Reusing cached package for: {lesson_data['topic']}")
+        for step in range(1, 8):
+            self._report(progress, step, "Reused cached package", 'done')
+        
+        files = dict(manifest['files'], package=zip_path)
+        timings = {'package_cache': round(time.perf_counter() - started, 4)}
+        self._record_metrics('lesson_plan', timings, {}, zip_path)
+        return {
+            'status': 'success',
+            'files': files,
+            'download_url': f'/api/download/{download_id}',
+            'timings': timings,
+            'cached': True
+        }
+    
+    def render_documents(self, lesson_data, ai_content, progress=None, timings=None):
+        """Run the five document builders and return {name: (filename, bytes)}
+
+        Builders run on the render pool unless render_mode is 'serial'.
+        Per-builder durations are added to timings when a dict is passed.
+        """
+        if timings is None:
+            timings = {}
+        documents = {}
+        
+        if self.render_mode == 'serial':
+            for name, method, step, label in DOCUMENT_BUILDERS:
+                self._report(progress, step, f"{label}...")
+                try:
+                    documents[name], timings[name] = _run_builder(self, method, lesson_data, ai_content)
+                except Exception:
+                    metrics.inc('lesson_stage_errors_total', stage=name)
+                    raise
+                self._report(progress, step, f"{label} done", 'done')
+            return documents
+        
+        executor = self._get_render_executor()
+        futures = {}
+        for name, method, step, label in DOCUMENT_BUILDERS:
+            self._report(progress, step, f"{label}...")
+            futures[executor.submit(_run_builder, self._task_generator(), method, lesson_data, ai_content)] = (name, step, label)
+        
+        try:
+            for future in as_completed(futures):
+                name, step, label = futures[future]
+                documents[name], timings[name] = self._builder_result(future, name)
+                self._report(progress, step, f"{label} done", 'done')
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        
+        return documents
+    
+    def _builder_result(self, future, name):
+        """future.result() of a render job, counting a failure against its builder"""
+        try:
+            return future.result()
+        except Exception:
+            metrics.inc('lesson_stage_errors_total', stage=name)
+            raise
+    
+    def _record_metrics(self, kind, timings, documents, package_path):
+        """Export stage timings and output sizes of a finished package"""
+        if not metrics.enabled:
+            return
+        for stage, seconds in timings.items():
+            metrics.observe('lesson_stage_seconds', seconds, kind=kind, stage=stage)
+        for name, (_, data) in documents.items():
+            metrics.observe('lesson_output_bytes', len(data), document=name)
+        metrics.observe('lesson_output_bytes', os.path.getsize(package_path), document=f'{kind}_package')
+    
+    def _get_render_executor(self):
+        """Create the shared render pool on first use (after any fork)"""
+        with self._render_lock:
+            if self._render_executor is None:
+                if self.render_mode == 'process':
+                    # Each process unpickles the generator once and reuses its template pools
+                    self._render_executor = ProcessPoolExecutor(
+                        max_workers=self.render_workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_render_process, initargs=(self,))
+                else:
+                    self._render_executor = ThreadPoolExecutor(
+                        max_workers=self.render_workers,
+                        thread_name_prefix='lesson-render')
+            return self._render_executor
+    
+    def _task_generator(self):
+        """Generator sent with each builder task: None for render processes, which hold their own"""
+        return None if self.render_mode == 'process' else self
+    
+    def _parse_docx_engine(self, setting):
+        setting = setting.strip()
+        if setting in ('', 'python-docx'):
+            return frozenset()
+        if setting == 'fast':
+            return frozenset(FAST_DOCX_BUILDERS)
+        builders = {name.strip() for name in setting.split(',') if name.strip()}
+        unknown = builders - set(FAST_DOCX_BUILDERS)
+        if unknown:
+            print(f"No fast Word writer for {', '.join(sorted(unknown))}, using python-docx for them")
+        return frozenset(builders & set(FAST_DOCX_BUILDERS))
+    
+    def _new_document(self, builder):
+        """Empty Word document for a builder: FastDocument when enabled, else python-docx"""
+        return FastDocument() if builder in self.fast_docx_builders else Document()
+    
+    def _create_template_pools(self):
+        self.lesson_plan_templates = TemplatePool(
+            os.path.join(self.template_folder, 'lesson_plan_template.docx'), Document,
+            size=self.template_pool_size,
+            indexer=partial(build_placeholder_index, placeholders=LESSON_PLAN_FIELDS))
+        # School-branded slide master if present, otherwise the 4:3 default presentation
+        self.ppt_templates = TemplatePool(
+            os.path.join(self.template_folder, 'ppt_master.pptx'), Presentation,
+            size=self.template_pool_size, indexer=_index_slide_layouts,
+            fallback=_default_ppt_master)
+    
+    def warm_templates(self):
+        """Parse document templates now instead of on the first request"""
+        self.lesson_plan_templates.warm()
+        self.ppt_templates.warm()
+    
+    def template_stats(self):
+        return {
+            'lesson_plan': self.lesson_plan_templates.stats(),
+            'powerpoint': self.ppt_templates.stats()
+        }
+    
+    def __getstate__(self):
+        # Render pools and locks stay in the parent when builders run in worker processes
+        state = self.__dict__.copy()
+        state['_render_executor'] = None
+        state['_render_lock'] = None
+        state['content_cache'] = None
+        state['package_cache'] = None
+        state['ai_client'] = None
+        state['storage'] = None
+        state['question_store'] = None
+        state['lesson_plan_templates'] = None
+        state['ppt_templates'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._render_lock = threading.Lock()
+        self._create_template_pools()
+    
+    def _report(self, progress, step, message, status='running', data=None):
+        """Forward a pipeline step to the progress callback"""
+        if progress:
+            if data is None:
+                progress(step, message, status)
+            else:
+                progress(step, message, status, data)
+    
+    def _report_section(self, progress, section, content):
+        """Publish a finished ai_content section (status 'section') during step 1"""
+        self._report(progress, 1, f"{AI_CONTENT_SECTIONS[section]} ready", 'section',
+                     {'section': section, 'title': AI_CONTENT_SECTIONS[section], 'content': content})
+    
+    def generate_ai_content(self, lesson_data, skip_sections=()):
+        """Generate comprehensive lesson content, reusing cached content for identical lessons"""
+        return dict(self.iter_ai_content(lesson_data, skip_sections))
+    
+    def iter_ai_content(self, lesson_data, skip_sections=()):
+        """Yield (section, content) for each ai_content section as soon as it is ready
+
+        With an AI client the model's answer is streamed and every section is
+        yielded the moment its line has been parsed. Sections the model did
+        not deliver (or everything, after a failure) come from the template
+        content. Only complete model answers are stored in the content cache.
+        skip_sections are neither requested nor filled in (the caller has them)
+        unless the whole lesson is already cached.
+        """
+        key, cached = self._cached_ai_content(lesson_data)
+        if cached is not None:
+            for section in AI_CONTENT_SECTIONS:
+                yield section, cached[section]
+            return
+        
+        ai_content = {}
+        complete = True
+        
+        if self.ai_client is not None:
+            try:
+                for section, generated in self._stream_ai_sections(self._build_prompt(lesson_data, skip_sections)):
+                    if section not in skip_sections and self._accept_ai_section(lesson_data, ai_content,
+                                                                                section, generated):
+                        yield section, ai_content[section]
+            except AIClientError as e:
+                complete = self._ai_content_failed(e)
+        
+        yield from self._template_sections(lesson_data, ai_content, skip_sections)
+        self._cache_ai_content(key, ai_content, complete and not skip_sections)
+    
+    async def aiter_ai_content(self, lesson_data):
+        """Async version of iter_ai_content that awaits the model's streamed answer
+
+        Content cache reads and writes (locks and file I/O) run on the loop's executor.
+        """
+        loop = asyncio.get_running_loop()
+        key, cached = await loop.run_in_executor(None, self._cached_ai_content, lesson_data)
+        if cached is not None:
+            for section in AI_CONTENT_SECTIONS:
+                yield section, cached[section]
+            return
+        
+        ai_content = {}
+        complete = True
+        
+        if self.ai_client is not None:
+            try:
+                async for section, generated in self._astream_ai_sections(self._build_prompt(lesson_data)):
+                    if self._accept_ai_section(lesson_data, ai_content, section, generated):
+                        yield section, ai_content[section]
+            except AIClientError as e:
+                complete = self._ai_content_failed(e)
+        
+        for section, content in self._template_sections(lesson_data, ai_content):
+            yield section, content
+        await loop.run_in_executor(None, self._cache_ai_content, key, ai_content, complete)
+    
+    def _cached_ai_content(self, lesson_data):
+        """(content cache key or None, cached ai_content or None)"""
+        key = content_key(lesson_data) if self.content_cache is not None else None
+        return key, self.content_cache.get(key) if key is not None else None
+    
+    def _accept_ai_section(self, lesson_data, ai_content, section, generated):
+        """Merge one streamed section into ai_content; False for unknown or repeated sections"""
+        if section not in AI_CONTENT_SECTIONS or section in ai_content:
+            return False
+        template = {section: self._generate_section(section, lesson_data)}
+        ai_content[section] = self._merge_ai_content(template, {section: generated})[section]
+        return True
+    
+    def _ai_content_failed(self, error):
+        print(f"AI generation failed, using template content: {str(error)}")
+        metrics.inc('lesson_stage_errors_total', stage='ai_content')
+        return False
+    
+    def _template_sections(self, lesson_data, ai_content, skip_sections=()):
+        """Fill and yield the sections the model did not deliver"""
+        for section in AI_CONTENT_SECTIONS:
+            if section not in ai_content and section not in skip_sections:
+                ai_content[section] = self._generate_section(section, lesson_data)
+                yield section, ai_content[section]
+    
+    def _cache_ai_content(self, key, ai_content, complete):
+        # Template fallbacks after an AI failure are not cached, so the next request retries the model
+        if key is not None and complete:
+            self.content_cache.put(key, {section: ai_content[section] for section in AI_CONTENT_SECTIONS})
+    
+    def _stream_ai_sections(self, prompt):
+        """Parse the model's streamed answer into (section, content) pairs, one JSON object per line"""
+        buffer = ''
+        for chunk in self.ai_client.stream(prompt):
+            buffer += chunk
+            *lines, buffer = buffer.split('\n')
+            for line in lines:
+                parsed = self._parse_section_line(line)
+                if parsed:
+                    yield parsed
+        parsed = self._parse_section_line(buffer)
+        if parsed:
+            yield parsed
+    
+    async def _astream_ai_sections(self, prompt):
+        """Async version of _stream_ai_sections"""
+        buffer = ''
+        async for chunk in self.ai_client.astream(prompt):
+            buffer += chunk
+            *lines, buffer = buffer.split('\n')
+            for line in lines:
+                parsed = self._parse_section_line(line)
+                if parsed:
+                    yield parsed
+        parsed = self._parse_section_line(buffer)
+        if parsed:
+            yield parsed
+    
+    def _parse_section_line(self, line):
+        line = line.strip().rstrip(',')
+        if not line.startswith('{'):
+            return None
+        try:
+            item = json.loads(line)
+        except ValueError:
+            return None
+        if isinstance(item, dict) and 'section' in item and 'content' in item:
+            return item['section'], item['content']
+        return None
+    
+    def _build_prompt(self, lesson_data, skip_sections=()):
+        """Build the model prompt for one lesson, leaving out skip_sections"""
         
         # Build comprehensive prompt
         period_descriptions = {
@@ -84,6 +943,10 @@ class LessonPlanGenerator:
         
         period_desc = period_descriptions.get(int(lesson_data['period']), period_descriptions[1])
         
+        # Kept out of the f-string below: backslashes in f-string expressions need Python 3.12+
+        gifted_tasks = ("**Gifted/Talented (DOK 4):**\n   - Activity: [detailed description]\n   - Questions: [list 3-5 questions]\n   - V/A/K: [indicate learning styles]"
+                        if lesson_data['gifted_talented'] else "")
+        
         prompt = f"""You are an expert educational content designer for Al Adhwa Private School in the UAE. Generate a comprehensive, pedagogically-sound lesson plan with the following specifications:
 
 **LESSON DETAILS:**
@@ -147,7 +1010,7 @@ class LessonPlanGenerator:
    - Questions: [list 3-5 questions]
    - V/A/K: [indicate learning styles]
    
-   {"**Gifted/Talented (DOK 4):**\\n   - Activity: [detailed description]\\n   - Questions: [list 3-5 questions]\\n   - V/A/K: [indicate learning styles]" if lesson_data['gifted_talented'] else ""}
+   {gifted_tasks}
 
 8. **INDEPENDENT TASKS (15 minutes):**
    Same structure as Cooperative Tasks, but for individual work
@@ -169,87 +1032,103 @@ class LessonPlanGenerator:
 11. **SKILLS DEVELOPED:**
     - List 3-4 key skills (e.g., Critical Thinking, Collaboration, Digital Literacy, Problem Solving)
 
-Return the content in a structured JSON format with clear sections."""
+Return the content in a structured JSON format with clear sections. Reply with one JSON object per line, shaped
+{{"section": <key>, "content": <value>}}, and nothing else. Send the sections in this order, using these keys:
+objectives (string); differentiated_outcomes (assistance, average, upper, gifted strings); vocabulary (list of terms);
+resources (list); starter (activity, question); teaching_component (method, steps list);
+cooperative_tasks and independent_tasks (assistance, average, upper, gifted - each with activity, questions list, vak);
+plenary (activity, real_world_connection, reflection_questions list, forward_connection);
+adek_integration (my_identity, moral_education, steam with science/technology/engineering/art/math, links_to_subjects, environment);
+skills (list)."""
+        if skip_sections:
+            prompt += f"\n\nDo not send {', '.join(skip_sections)}: they are shared with other lessons of this unit."
 
-        # For now, generate structured content (in production, this would call actual AI API)
-        ai_content = self._generate_structured_content(lesson_data, period_desc)
-        
-        return ai_content
+        return prompt
     
-    def _generate_structured_content(self, lesson_data, period_desc):
-        """Generate structured lesson content"""
+    def _merge_ai_content(self, template, generated):
+        """Overlay model output on the template content, keeping only keys and types the documents expect"""
+        merged = dict(template)
+        for key, value in generated.items():
+            if key not in template:
+                continue
+            expected = template[key]
+            if isinstance(expected, dict) and isinstance(value, dict):
+                merged[key] = self._merge_ai_content(expected, value)
+            elif isinstance(value, type(expected)) and value:
+                merged[key] = value
+        return merged
+    
+    def _generate_section(self, section, lesson_data):
+        """Generate one section of the structured template content
+
+        The fixed text lives in content_tables; only the topic (and platform) are filled in here.
+        """
         
         topic = lesson_data['topic']
         subject = lesson_data['subject']
         grade = lesson_data['grade']
-        period = lesson_data['period']
         
         # This is a comprehensive template that would be filled by AI
         # For demonstration, providing structured template
         
-        content = {
-            'objectives': f"Students will analyze and evaluate {topic} through investigation, experimentation, and application of {subject} principles to real-world scenarios.",
-            
-            'differentiated_outcomes': {
-                'assistance': f"Identify and describe key characteristics of {topic} with support (DOK 1-2)",
-                'average': f"Analyze the relationship between variables in {topic} using data and graphs (DOK 2-3)",
-                'upper': f"Evaluate experimental results for {topic}, calculate errors, and justify findings by identifying systematic error sources (DOK 3-4)",
-                'gifted': f"Design and conduct an original investigation extending {topic} concepts to novel real-world applications with comprehensive analysis (DOK 4)" if lesson_data['gifted_talented'] else None
-            },
-            
-            'vocabulary': self._generate_vocabulary(topic, subject),
-            
-            'resources': self._generate_resources(lesson_data),
-            
-            'starter': self._generate_starter(topic, subject, grade),
-            
-            'teaching_component': self._generate_teaching_component(lesson_data),
-            
-            'cooperative_tasks': self._generate_differentiated_tasks(lesson_data, 'cooperative'),
-            
-            'independent_tasks': self._generate_differentiated_tasks(lesson_data, 'independent'),
-            
-            'plenary': self._generate_plenary(topic, subject),
-            
-            'adek_integration': self._generate_adek_integration(lesson_data),
-            
-            'skills': ["Critical Thinking", "Collaboration", "Digital Literacy", "Problem Solving"]
-        }
+        if section == 'objectives':
+            before, middle, after = content_tables.OBJECTIVES
+            return f"{before}{topic}{middle}{subject}{after}"
+        
+        if section == 'differentiated_outcomes':
+            outcomes = content_tables.DIFFERENTIATED_OUTCOMES
+            return {
+                'assistance': topic.join(outcomes['assistance']),
+                'average': topic.join(outcomes['average']),
+                'upper': topic.join(outcomes['upper']),
+                'gifted': topic.join(outcomes['gifted']) if lesson_data['gifted_talented'] else None
+            }
+        
+        if section == 'vocabulary':
+            return self._generate_vocabulary(topic, subject)
+        
+        if section == 'resources':
+            return self._generate_resources(lesson_data)
+        
+        if section == 'starter':
+            return self._generate_starter(topic, subject, grade)
+        
+        if section == 'teaching_component':
+            return self._generate_teaching_component(lesson_data)
+        
+        if section == 'cooperative_tasks':
+            return self._generate_differentiated_tasks(lesson_data, 'cooperative')
+        
+        if section == 'independent_tasks':
+            return self._generate_differentiated_tasks(lesson_data, 'independent')
+        
+        if section == 'plenary':
+            return self._generate_plenary(topic, subject)
+        
+        if section == 'adek_integration':
+            return self._generate_adek_integration(lesson_data)
+        
+        if section == 'skills':
+            return list(content_tables.SKILLS)
         
-        return content
+        raise KeyError(f"Unknown content section: {section}")
     
     def _generate_vocabulary(self, topic, subject):
         """Generate vocabulary list"""
         # This would be AI-generated in production
-        vocab_templates = {
-            'Physics': ['Amplitude', 'Period', 'Frequency', 'Wavelength', 'Velocity', 'Acceleration', 'Force', 'Energy'],
-            'Chemistry': ['Molecule', 'Atom', 'Reaction', 'Catalyst', 'Solution', 'Compound', 'Element', 'Bond'],
-            'Biology': ['Cell', 'Organism', 'Ecosystem', 'Evolution', 'Genetics', 'Metabolism', 'Homeostasis', 'Species'],
-            'Math': ['Variable', 'Equation', 'Function', 'Coefficient', 'Constant', 'Expression', 'Solution', 'Graph'],
-            'default': ['Concept', 'Process', 'Analysis', 'Evaluation', 'Application', 'Synthesis', 'Investigation', 'Conclusion']
-        }
-        
-        return vocab_templates.get(subject, vocab_templates['default'])
+        return list(content_tables.VOCABULARY.get(subject, content_tables.VOCABULARY['default']))
     
     def _generate_resources(self, lesson_data):
         """Generate resource list"""
-        resources = [
-            "Laptop/Tablet for each student or group",
-            "Calculator (scientific)",
-            "Whiteboard and markers",
-            "Student notebooks"
-        ]
-        
         if lesson_data['digital_platform']:
-            resources.insert(0, f"{lesson_data['digital_platform']} simulation/platform access")
-        
-        return resources
+            return [f"{lesson_data['digital_platform']} simulation/platform access", *content_tables.RESOURCES]
+        return list(content_tables.RESOURCES)
     
     def _generate_starter(self, topic, subject, grade):
         """Generate engaging starter"""
         return {
-            'activity': f"Real-world connection: Show a 30-second video or image demonstrating {topic} in everyday life (e.g., playground swings, car suspension, building design). Students observe and note 3 things they notice.",
-            'question': f"How do you think understanding {topic} helps engineers design safer, more efficient systems in our daily lives?",
+            'activity': topic.join(content_tables.STARTER_ACTIVITY),
+            'question': topic.join(content_tables.STARTER_QUESTION),
             'duration': '5 minutes'
         }
     
@@ -260,15 +1139,7 @@ Return the content in a structured JSON format with clear sections."""
         return {
             'duration': '10 minutes maximum',
             'method': f"Interactive demonstration using {platform}",
-            'steps': [
-                f"1. Introduce key concept of {lesson_data['topic']}",
-                "2. Define independent and dependent variables",
-                "3. Demonstrate the relationship using platform/simulation",
-                "4. Model data collection process",
-                "5. Show how to organize data in tables",
-                "6. Demonstrate graphing techniques",
-                "7. Guide students in identifying patterns"
-            ]
+            'steps': fill_list(content_tables.TEACHING_STEPS, lesson_data['topic'])
         }
     
     def _generate_differentiated_tasks(self, lesson_data, task_type):
@@ -277,57 +1148,14 @@ Return the content in a structured JSON format with clear sections."""
         topic = lesson_data['topic']
         tasks = {}
         
-        # Those Needing Assistance (DOK 1-2)
-        tasks['assistance'] = {
-            'activity': f"{'In groups,' if task_type == 'cooperative' else 'Individually,'} students will identify and measure basic characteristics of {topic} using guided worksheets with step-by-step instructions and visual aids.",
-            'questions': [
-                f"1. What are the main parts/components of {topic}? (DOK 1)",
-                f"2. How do you measure [key variable] in this setup? (DOK 1)",
-                f"3. Record your measurements in the provided table. (DOK 1)",
-                f"4. Describe what happens when you change [one variable]. (DOK 2)",
-                f"5. Which setup showed the [largest/smallest] value? Why? (DOK 2)"
-            ],
-            'vak': 'Visual (diagrams, charts), Kinesthetic (hands-on measurement), Auditory (group discussion)' if task_type == 'cooperative' else 'Visual (worksheets), Kinesthetic (measurements), Auditory (self-explanation)'
-        }
-        
-        # Average/Middle (DOK 2-3)
-        tasks['average'] = {
-            'activity': f"{'Groups' if task_type == 'cooperative' else 'Students'} will conduct systematic investigations of {topic}, collect data across multiple trials, create graphs, and analyze relationships between variables.",
-            'questions': [
-                f"1. What pattern do you observe in your data for {topic}? (DOK 2)",
-                f"2. Create a graph showing the relationship between [variable A] and [variable B]. (DOK 2)",
-                f"3. Explain why the relationship follows this pattern. (DOK 3)",
-                f"4. What factors might affect the accuracy of your results? (DOK 3)",
-                f"5. Predict what would happen if you doubled [one variable]. Test your prediction. (DOK 3)"
-            ],
-            'vak': 'Visual (graphs, data visualization), Kinesthetic (experimentation), Auditory (explanation and discussion)' if task_type == 'cooperative' else 'Visual (data analysis), Kinesthetic (investigation), Auditory (verbal reasoning)'
-        }
-        
-        # Upper Ability (DOK 3-4)
-        tasks['upper'] = {
-            'activity': f"{'Collaborative teams' if task_type == 'cooperative' else 'Students independently'} will design comprehensive investigations, conduct error analysis, evaluate theoretical vs. experimental results, and justify discrepancies through systematic error identification.",
-            'questions': [
-                f"1. Design an investigation to determine the mathematical relationship in {topic}. (DOK 3)",
-                f"2. Analyze your graph's slope and calculate its theoretical value. Compare and explain any differences. (DOK 3)",
-                f"3. Calculate the percentage error between your results and theoretical predictions. (DOK 3)",
-                f"4. Evaluate your experimental method: What systematic errors exist? How do they affect results? (DOK 4)",
-                f"5. Propose improvements to reduce errors and justify why your modifications would work. (DOK 4)"
-            ],
-            'vak': 'Visual (complex graphs, error bars), Kinesthetic (precise measurements), Auditory (justification and evaluation)' if task_type == 'cooperative' else 'Visual (detailed analysis), Kinesthetic (refined experimentation), Auditory (critical reasoning)'
-        }
-        
-        # Gifted/Talented (DOK 4) - if enabled
-        if lesson_data['gifted_talented']:
-            tasks['gifted'] = {
-                'activity': f"{'Advanced research teams' if task_type == 'cooperative' else 'Individual advanced investigation:'} Design and conduct an original research project extending {topic} to real-world applications. Develop novel experimental setups, conduct comprehensive error analysis, and present findings with professional-level documentation.",
-                'questions': [
-                    f"1. Design an original investigation applying {topic} principles to solve a real-world engineering problem. (DOK 4)",
-                    f"2. Synthesize data from multiple trials using statistical analysis (mean, standard deviation, confidence intervals). (DOK 4)",
-                    f"3. Evaluate competing theoretical models and determine which best explains your empirical findings. (DOK 4)",
-                    f"4. Create a research proposal for extending this investigation, including hypothesis, methodology, and predicted outcomes. (DOK 4)",
-                    f"5. Defend your conclusions: How would you respond to a scientist who challenges your error analysis? (DOK 4)"
-                ],
-                'vak': 'Visual (professional graphs, presentations), Kinesthetic (advanced experimentation), Auditory (research defense)' if task_type == 'cooperative' else 'Visual (research documentation), Kinesthetic (novel experimental design), Auditory (critical evaluation)'
+        # Assistance (DOK 1-2), average (DOK 2-3), upper (DOK 3-4), and gifted (DOK 4) if enabled
+        for level, activity, questions, vak in content_tables.DIFFERENTIATED_TASKS[task_type]:
+            if level == 'gifted' and not lesson_data['gifted_talented']:
+                continue
+            tasks[level] = {
+                'activity': topic.join(activity),
+                'questions': fill_list(questions, topic),
+                'vak': vak
             }
         
         return tasks
@@ -336,60 +1164,50 @@ Return the content in a structured JSON format with clear sections."""
         """Generate impressive plenary"""
         return {
             'duration': '5 minutes',
-            'activity': f"Class discussion connecting {topic} to real-world applications",
-            'real_world_connection': f"Discuss how understanding {topic} is crucial in modern technology, engineering, and daily life. Show examples from UAE infrastructure, renewable energy projects, or cutting-edge technology.",
-            'reflection_questions': [
-                f"What was the most surprising thing you learned about {topic} today?",
-                f"How could you apply this knowledge to solve a problem in your community?",
-                "What questions do you still have that you'd like to investigate further?"
-            ],
-            'forward_connection': f"Next lesson, we'll explore how {topic} connects to [related advanced concept], building on today's foundations."
+            'activity': topic.join(content_tables.PLENARY_ACTIVITY),
+            'real_world_connection': topic.join(content_tables.PLENARY_CONNECTION),
+            'reflection_questions': fill_list(content_tables.PLENARY_QUESTIONS, topic),
+            'forward_connection': topic.join(content_tables.PLENARY_FORWARD)
         }
     
     def _generate_adek_integration(self, lesson_data):
         """Generate ADEK curriculum integration"""
         return {
-            'my_identity': "Relate the scientific principles to UAE's innovation and technological advancement, showing how understanding these concepts contributes to national development and global competitiveness.",
-            'moral_education': "Discuss the importance of honesty in scientific reporting, integrity in data collection, and perseverance when experiments don't yield expected results.",
+            'my_identity': content_tables.ADEK_MY_IDENTITY,
+            'moral_education': content_tables.ADEK_MORAL_EDUCATION,
             'steam': {
-                'science': f"Investigate {lesson_data['topic']} through experimentation and observation",
-                'technology': lesson_data['digital_platform'] if lesson_data['digital_platform'] else "Use digital tools for data collection and analysis",
-                'engineering': "Apply concepts to solve real-world engineering challenges",
-                'art': "Create visual representations (graphs, diagrams) to communicate findings",
-                'math': "Use mathematical formulas, graphing, and statistical analysis"
+                'science': lesson_data['topic'].join(content_tables.ADEK_SCIENCE),
+                'technology': lesson_data['digital_platform'] or content_tables.ADEK_TECHNOLOGY,
+                'engineering': content_tables.ADEK_ENGINEERING,
+                'art': content_tables.ADEK_ART,
+                'math': content_tables.ADEK_MATH
             },
-            'links_to_subjects': "Mathematics (graphing, equations), ICT (digital simulations), Engineering (design thinking), Art (visual communication)",
-            'environment': "Discuss how scientific understanding helps develop sustainable technologies and protect our environment"
+            'links_to_subjects': content_tables.ADEK_LINKS,
+            'environment': content_tables.ADEK_ENVIRONMENT
         }
     
     def create_lesson_plan_document(self, lesson_data, ai_content):
         """Create the filled lesson plan Word document"""
         try:
-            # Load template
-            template_path = os.path.join(self.template_folder, 'lesson_plan_template.docx')
-            doc = Document(template_path)
+            # Take a pre-parsed copy of the template
+            doc, field_index = self.lesson_plan_templates.acquire()
+            if doc is None:
+                raise FileNotFoundError(f"Template not found at '{self.lesson_plan_templates.path}'")
             
             # Fill in the document
-            # This is a simplified version - full implementation would parse and fill each table cell
-            self._fill_document_fields(doc, lesson_data, ai_content)
+            self._fill_document_fields(doc, field_index, lesson_data, ai_content)
             
             # Save
-            filename = f"LessonPlan_{lesson_data['subject']}_{lesson_data['topic'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.docx"
-            output_path = os.path.join(self.output_folder, filename)
-            doc.save(output_path)
-            
-            return output_path
+            filename = f"LessonPlan_{_safe_name(lesson_data['subject'])}_{_safe_name(lesson_data['topic'])}_{datetime.now().strftime('%Y%m%d')}.docx"
+            return self._save_document(doc, filename)
         
         except Exception as e:
             print(f"Error creating lesson plan document: {str(e)}")
             # Create a basic document if template loading fails
             return self._create_basic_lesson_plan(lesson_data, ai_content)
     
-    def _fill_document_fields(self, doc, lesson_data, ai_content):
-        """Fill document fields with generated content"""
-        # This would involve complex table navigation and cell filling
-        # Simplified version for demonstration
-        
+    def _fill_document_fields(self, doc, field_index, lesson_data, ai_content):
+        """Fill template fields (body, table cells, headers, footers) with lesson details"""
         replacements = {
             'Date:': f"Date: {lesson_data['date']}",
             'SEMESTER:': f"SEMESTER: {lesson_data['semester']}",
@@ -400,10 +1218,7 @@ Return the content in a structured JSON format with clear sections."""
             'Value:': f"Value: {lesson_data['value']}"
         }
         
-        for paragraph in doc.paragraphs:
-            for key, value in replacements.items():
-                if key in paragraph.text:
-                    paragraph.text = paragraph.text.replace(key, value)
+        fill_placeholders(doc, field_index, replacements)
     
     def _create_basic_lesson_plan(self, lesson_data, ai_content):
         """Create a basic lesson plan document"""
@@ -441,15 +1256,12 @@ Return the content in a structured JSON format with clear sections."""
             doc.add_paragraph(word, style='List Bullet')
         
         # Save
-        filename = f"LessonPlan_{lesson_data['subject']}_{lesson_data['topic'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.docx"
-        output_path = os.path.join(self.output_folder, filename)
-        doc.save(output_path)
-        
-        return output_path
+        filename = f"LessonPlan_{_safe_name(lesson_data['subject'])}_{_safe_name(lesson_data['topic'])}_{datetime.now().strftime('%Y%m%d')}.docx"
+        return self._save_document(doc, filename)
     
     def create_worksheets(self, lesson_data, ai_content):
         """Create differentiated worksheets"""
-        doc = Document()
+        doc = self._new_document('worksheets')
         
         doc.add_heading('DIFFERENTIATED WORKSHEETS', 0)
         doc.add_heading(f'Topic: {lesson_data["topic"]}', 1)
@@ -487,15 +1299,12 @@ Return the content in a structured JSON format with clear sections."""
                 doc.add_paragraph()
         
         # Save
-        filename = f"Worksheets_{lesson_data['topic'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.docx"
-        output_path = os.path.join(self.output_folder, filename)
-        doc.save(output_path)
-        
-        return output_path
+        filename = f"Worksheets_{_safe_name(lesson_data['topic'])}_{datetime.now().strftime('%Y%m%d')}.docx"
+        return self._save_document(doc, filename)
     
     def create_rubrics(self, lesson_data, ai_content):
         """Create assessment rubrics"""
-        doc = Document()
+        doc = self._new_document('rubrics')
         
         doc.add_heading('ASSESSMENT RUBRICS', 0)
         doc.add_heading(f'Topic: {lesson_data["topic"]}', 1)
@@ -530,43 +1339,24 @@ Return the content in a structured JSON format with clear sections."""
             cells[4].text = 'Demonstrates limited understanding, requires significant support'
         
         # Save
-        filename = f"Rubrics_{lesson_data['topic'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.docx"
-        output_path = os.path.join(self.output_folder, filename)
-        doc.save(output_path)
-        
-        return output_path
+        filename = f"Rubrics_{_safe_name(lesson_data['topic'])}_{datetime.now().strftime('%Y%m%d')}.docx"
+        return self._save_document(doc, filename)
     
     def create_question_bank(self, lesson_data, ai_content):
         """Create question bank organized by DOK levels"""
-        doc = Document()
+        doc = self._new_document('question_bank')
         
         doc.add_heading('QUESTION BANK', 0)
         doc.add_heading(f'Topic: {lesson_data["topic"]}', 1)
         doc.add_heading(f'Grade: {lesson_data["grade"]} | Subject: {lesson_data["subject"]}', 2)
         
-        # Organize questions by DOK level
-        dok_sections = {
-            'DOK Level 1 (Recall & Reproduction)': [],
-            'DOK Level 2 (Skills & Concepts)': [],
-            'DOK Level 3 (Strategic Thinking)': [],
-            'DOK Level 4 (Extended Thinking)': []
-        }
-        
-        # Extract questions from tasks
+        # Extract questions from tasks and organize them by DOK level
         all_tasks = {**ai_content['cooperative_tasks'], **ai_content['independent_tasks']}
-        
-        for level, tasks in all_tasks.items():
-            if isinstance(tasks, dict) and 'questions' in tasks:
-                for question in tasks['questions']:
-                    # Determine DOK level from question
-                    if 'identify' in question.lower() or 'define' in question.lower() or 'list' in question.lower():
-                        dok_sections['DOK Level 1 (Recall & Reproduction)'].append(question)
-                    elif 'analyze' in question.lower() or 'compare' in question.lower() or 'explain' in question.lower():
-                        dok_sections['DOK Level 2 (Skills & Concepts)'].append(question)
-                    elif 'evaluate' in question.lower() or 'justify' in question.lower() or 'predict' in question.lower():
-                        dok_sections['DOK Level 3 (Strategic Thinking)'].append(question)
-                    else:
-                        dok_sections['DOK Level 4 (Extended Thinking)'].append(question)
+        questions = [question for tasks in all_tasks.values()
+                     if isinstance(tasks, dict) and 'questions' in tasks
+                     for question in tasks['questions']]
+        grouped = dok.classifier.group_by_level(questions)
+        dok_sections = {DOK_LEVELS[level]: grouped[level] for level in DOK_LEVELS}
         
         # Add questions to document
         for dok_level, questions in dok_sections.items():
@@ -578,20 +1368,15 @@ Return the content in a structured JSON format with clear sections."""
                     doc.add_paragraph()
         
         # Save
-        filename = f"QuestionBank_{lesson_data['topic'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.docx"
-        output_path = os.path.join(self.output_folder, filename)
-        doc.save(output_path)
-        
-        return output_path
+        filename = f"QuestionBank_{_safe_name(lesson_data['topic'])}_{datetime.now().strftime('%Y%m%d')}.docx"
+        return self._save_document(doc, filename)
     
     def create_powerpoint(self, lesson_data, ai_content):
         """Create PowerPoint presentation"""
-        prs = Presentation()
-        prs.slide_width = PptInches(10)
-        prs.slide_height = PptInches(7.5)
+        prs, layouts = self.ppt_templates.acquire()
         
         # Title Slide
-        title_slide = prs.slides.add_slide(prs.slide_layouts[0])
+        title_slide = prs.slides.add_slide(prs.slide_layouts[layouts['title']])
         title = title_slide.shapes.title
         subtitle = title_slide.placeholders[1]
         title.text = lesson_data['topic']
@@ -599,74 +1384,91 @@ Return the content in a structured JSON format with clear sections."""
         
         # Teaching model slides based on selection
         ppt_style = lesson_data.get('ppt_style', '7E Model')
+        stages = SLIDE_STAGES.get(ppt_style, SLIDE_STAGES['Traditional'])
         
-        if ppt_style == '7E Model':
-            self._create_7e_slides(prs, lesson_data, ai_content)
-        elif ppt_style == 'I Do, We Do, You Do':
-            self._create_gradual_release_slides(prs, lesson_data, ai_content)
-        elif ppt_style == '5E Model':
-            self._create_5e_slides(prs, lesson_data, ai_content)
-        else:
-            self._create_traditional_slides(prs, lesson_data, ai_content)
+        content_layout = prs.slide_layouts[layouts['content']]
+        for stage_name, section, text in stages:
+            slide = prs.slides.add_slide(content_layout)
+            slide.shapes.title.text = stage_name
+            
+            lines = self._slide_lines(ai_content[section] if section else text)
+            tf = slide.placeholders[1].text_frame
+            tf.text = lines[0]
+            for line in lines[1:]:
+                tf.add_paragraph().text = line
         
         # Save
-        filename = f"Presentation_{lesson_data['topic'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pptx"
-        output_path = os.path.join(self.output_folder, filename)
-        prs.save(output_path)
-        
-        return output_path
-    
-    def _create_7e_slides(self, prs, lesson_data, ai_content):
-        """Create 7E Model presentation slides"""
-        stages = [
-            ('Elicit', ai_content['starter']),
-            ('Engage', 'Hook students with real-world connection'),
-            ('Explore', ai_content['teaching_component']),
-            ('Explain', 'Present key concepts and vocabulary'),
-            ('Elaborate', ai_content['cooperative_tasks']),
-            ('Evaluate', 'Assessment and checking understanding'),
-            ('Extend', ai_content['plenary'])
-        ]
+        filename = f"Presentation_{_safe_name(lesson_data['topic'])}_{datetime.now().strftime('%Y%m%d')}.pptx"
+        return self._save_document(prs, filename)
+    
+    def _slide_lines(self, content):
+        """Bullet lines for one slide body from an ai_content section"""
+        if isinstance(content, list):
+            return [str(item) for item in content] or ['']
+        if not isinstance(content, dict):
+            return [str(content)]
         
-        for stage_name, content in stages:
-            slide = prs.slides.add_slide(prs.slide_layouts[1])
-            title = slide.shapes.title
-            title.text = f"{stage_name}"
-            
-            body = slide.placeholders[1]
-            tf = body.text_frame
-            
-            if isinstance(content, dict):
-                if 'activity' in content:
-                    tf.text = content['activity']
-                elif 'method' in content:
-                    tf.text = content['method']
-                else:
-                    tf.text = str(content)
-            else:
-                tf.text = str(content)
+        if 'activity' in content:
+            lines = [content['activity']]
+            if content.get('question'):
+                lines.append(content['question'])
+            lines.extend(content.get('reflection_questions', []))
+            return lines
+        if 'method' in content:
+            return [content['method']] + list(content.get('steps', []))
+        
+        # Differentiated tasks: one line per ability group
+        tiers = [(level, tasks) for level, tasks in content.items() if isinstance(tasks, dict) and 'activity' in tasks]
+        if tiers:
+            return [f"{level.replace('_', ' ').title()}: {tasks['activity']}" for level, tasks in tiers]
+        return [str(content)]
     
-    def _create_gradual_release_slides(self, prs, lesson_data, ai_content):
-        """Create I Do, We Do, You Do presentation slides"""
-        # Similar structure for other models
-        pass
+    def _save_document(self, doc, filename):
+        """Serialize a Word/PowerPoint document in memory as (filename, bytes)"""
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        return filename, buffer.getvalue()
     
-    def _create_5e_slides(self, prs, lesson_data, ai_content):
-        """Create 5E Model presentation slides"""
-        pass
+    def package_files(self, lesson_data, documents):
+        """Package in-memory (filename, bytes) documents into a single ZIP on disk"""
+        zip_path = self._output_path(self._package_filename(lesson_data))
+        self._write_zip(zip_path, [document for document in documents if document])
+        return zip_path
     
-    def _create_traditional_slides(self, prs, lesson_data, ai_content):
-        """Create traditional presentation slides"""
-        pass
+    def _output_path(self, filename):
+        """Where a finished package is written: a storage shard, or the output folder"""
+        if self.storage is not None:
+            return self.storage.path_for(filename)
+        return os.path.join(self.output_folder, filename)
     
-    def package_files(self, lesson_data, file_paths):
-        """Package all files into a ZIP"""
-        zip_filename = f"LessonPlanPackage_{lesson_data['subject']}_{lesson_data['topic'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-        zip_path = os.path.join(self.output_folder, zip_filename)
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path in file_paths:
-                if file_path and os.path.exists(file_path):
-                    zipf.write(file_path, os.path.basename(file_path))
+    def _store(self, path):
+        """Register a finished package and return the id its download URL uses"""
+        if self.storage is not None:
+            return self.storage.add(path)
+        return os.path.basename(path)
+    
+    def _write_zip(self, zip_path, members):
+        """Write (archive name, bytes) members using the configured compression policy
+
+        The archive is built under a temporary name and renamed into place, so a
+        package is either complete or absent; partial files are removed on failure.
+        """
+        date_time = datetime.now().timetuple()[:6]
+        policy = COMPRESSION_POLICIES[self.compression_policy]
+        tmp_path = f"{zip_path}.{os.getpid()}.{threading.get_ident()}.tmp"
         
-        return zip_path
+        try:
+            with zipfile.ZipFile(tmp_path, 'w') as zipf:
+                for filename, data in members:
+                    compress_type, level = policy.get(os.path.splitext(filename)[1].lower(), policy['default'])
+                    member = zipfile.ZipInfo(filename, date_time)
+                    member.external_attr = 0o644 << 16
+                    zipf.writestr(member, data, compress_type, level)
+            os.replace(tmp_path, zip_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def _package_filename(self, lesson_data):
+        return f"LessonPlanPackage_{_safe_name(lesson_data['subject'])}_{_safe_name(lesson_data['topic'])}_{_unique_suffix()}.zip"
@@ -0,0 +1,266 @@
+"""
+Metrics
+Counters and histograms exported in Prometheus text format on /metrics
+
+Each process keeps its own registry. With a metrics directory (LESSON_METRICS_DIR, set
+by gunicorn.conf.py) every process also writes a snapshot to <directory>/<pid>.json, and
+a scrape answered by any worker adds up the snapshots of all of them.
+"""
+
+import os
+import glob
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager, nullcontext
+
+# Histogram buckets: seconds for durations, bytes for output sizes
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = (4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+# name: (type, help, buckets)
+METRICS = {
+    'lesson_http_requests_total': ('counter', 'HTTP requests by endpoint and status code', None),
+    'lesson_http_request_seconds': ('histogram', 'Time to build an HTTP response', SECONDS_BUCKETS),
+    'lesson_jobs_total': ('counter', 'Finished generation jobs by kind and result', None),
+    'lesson_job_seconds': ('histogram', 'Generation job run time', SECONDS_BUCKETS),
+    'lesson_stage_seconds': ('histogram', 'Time spent in each generation stage', SECONDS_BUCKETS),
+    'lesson_stage_errors_total': ('counter', 'Failures by generation stage', None),
+    'lesson_output_bytes': ('histogram', 'Size of generated documents and packages', BYTES_BUCKETS),
+    'lesson_downloads_total': ('counter', 'Package downloads by result', None),
+    'lesson_jobs_coalesced_total': ('counter', 'Generation requests attached to an identical in-flight job', None),
+}
+
+_DISABLED_SPAN = nullcontext()
+
+
+class Metrics:
+    """Thread-safe registry for one process; every call is a no-op when disabled"""
+
+    def __init__(self, enabled=True, directory=None, flush_interval=5):
+        self.enabled = enabled
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = {}
+        self._flusher_pid = None
+        if enabled and directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_environment(cls):
+        """Enabled unless LESSON_METRICS is 0/false/off; shared across processes via LESSON_METRICS_DIR"""
+        return cls(os.environ.get('LESSON_METRICS', '1').lower() not in ('0', 'false', 'off', 'no'),
+                   directory=os.environ.get('LESSON_METRICS_DIR') or None)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        self._start_flusher()
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        self._start_flusher()
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for position, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[0][position] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def span(self, name, **labels):
+        """Context manager observing the duration of its block in seconds"""
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return self._span(name, labels)
+
+    @contextmanager
+    def _span(self, name, labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def add_collector(self, prefix, func):
+        """Export the numeric values of func() as lesson_<prefix>_<key> gauges at scrape time"""
+        self._collectors[prefix] = func
+
+    def flush(self):
+        """Write this process's snapshot to the metrics directory"""
+        if not (self.enabled and self.directory):
+            return
+        with self._lock:
+            snapshot = {
+                'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, labels, counts, total, count]
+                               for (name, labels), (counts, total, count) in self._histograms.items()]
+            }
+        snapshot['gauges'] = self._collect()
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing metrics snapshot: {str(e)}")
+
+    def render(self):
+        """All metrics in Prometheus text exposition format
+
+        Without a metrics directory these are this process's own. With one, counters
+        and histograms are summed over every process that wrote a snapshot (finished
+        workers included, so totals never go backwards) and gauges are reported per
+        live process with a pid label.
+        """
+        if self.directory:
+            self.flush()
+            counters, histograms, gauges = self._merge_snapshots()
+        else:
+            with self._lock:
+                counters = dict(self._counters)
+                histograms = {key: (list(counts), total, count)
+                              for key, (counts, total, count) in self._histograms.items()}
+            gauges = [((), self._collect())]
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            if kind == 'counter':
+                series = [(labels, value) for (metric, labels), value in sorted(counters.items()) if metric == name]
+            else:
+                series = [(labels, value) for (metric, labels), value in sorted(histograms.items()) if metric == name]
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                if kind == 'counter':
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {round(total, 6)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        series = {}
+        for labels, values in gauges:
+            for name, value in values.items():
+                series.setdefault(name, []).append((labels, value))
+        for name, values in sorted(series.items()):
+            lines.append(f"# HELP {name} {self._gauge_help(name)}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+    def _collect(self):
+        """{gauge name: value} from the collectors"""
+        gauges = {}
+        for prefix, func in sorted(self._collectors.items()):
+            try:
+                values = func()
+            except Exception as e:
+                print(f"Metrics collector {prefix} failed: {str(e)}")
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                gauges[f"lesson_{prefix}_{key}"] = value
+        return gauges
+
+    def _gauge_help(self, name):
+        """Generic HELP text for a collector gauge, naming the stats it comes from"""
+        prefixes = [prefix for prefix in self._collectors if name.startswith(f"lesson_{prefix}_")]
+        if not prefixes:
+            return "Value reported by a stats collector"
+        prefix = max(prefixes, key=len)
+        return f"{name[len(f'lesson_{prefix}_'):]} from the {prefix.replace('_', ' ')} stats"
+
+    def _merge_snapshots(self):
+        """(counters, histograms, [(pid labels, gauges)]) over all snapshots in the directory"""
+        counters, histograms, gauges = {}, {}, []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.json'))):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                pid = int(os.path.basename(path)[:-len('.json')])
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in snapshot.get('counters', []):
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, counts, total, count in snapshot.get('histograms', []):
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, ([0] * len(counts), 0.0, 0))
+                histograms[key] = ([a + b for a, b in zip(merged[0], counts)], merged[1] + total, merged[2] + count)
+            if process_alive(pid):
+                gauges.append(((('pid', str(pid)),), snapshot.get('gauges', {})))
+        return counters, histograms, gauges
+
+    def _start_flusher(self):
+        """Background snapshot writer, started once per process when a directory is set"""
+        if self.directory is None or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+def process_alive(pid):
+    """Whether a process with this pid still runs on this host"""
+    if pid == os.getpid() or os.name != 'posix':
+        # os.kill would terminate the process on Windows; callers fall back to age checks there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Shared by the app, the job queue and the generator in this process
+metrics = Metrics.from_environment()
@@ -0,0 +1,208 @@
+"""
+Question Store
+Keeps every question from generated lessons in a SQLite index by grade, subject, topic,
+DOK level and task type, with full-text search, so a unit's question bank can be
+assembled from earlier lessons without generating anything
+"""
+
+import os
+import time
+import queue
+import sqlite3
+import threading
+
+from dok import classifier, DOK_LEVELS
+
+# Task groups of ai_content that hold questions, stored as task_type
+TASK_TYPES = {'cooperative_tasks': 'cooperative', 'independent_tasks': 'independent'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    dok INTEGER NOT NULL,
+    task_type TEXT NOT NULL,
+    ability TEXT NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (subject, grade, topic, task_type, ability, text)
+);
+CREATE INDEX IF NOT EXISTS questions_dok ON questions (subject, grade, dok);
+CREATE INDEX IF NOT EXISTS questions_topic ON questions (topic);
+"""
+
+# External-content FTS5 index kept in step with the table by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    text, topic, content='questions', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+    INSERT INTO questions_fts (rowid, text, topic) VALUES (new.id, new.text, new.topic);
+END;
+CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+    INSERT INTO questions_fts (questions_fts, rowid, text, topic) VALUES ('delete', old.id, old.text, old.topic);
+END;
+"""
+
+COLUMNS = ('id', 'text', 'grade', 'subject', 'topic', 'dok', 'task_type', 'ability', 'created')
+
+
+class QuestionStore:
+    """SQLite question index shared by all worker processes
+
+    add_lesson() only queues rows; a background writer inserts them in batches so
+    the generation request path never waits on the database.
+    """
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            try:
+                db.executescript(FTS_SCHEMA)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: text search falls back to LIKE
+                print("SQLite has no FTS5; question search uses LIKE")
+                self.full_text = False
+
+    def add_lesson(self, lesson_data, ai_content):
+        """Queue every task question of a lesson; returns the number queued"""
+        rows = []
+        for group, task_type in TASK_TYPES.items():
+            for ability, task in (ai_content.get(group) or {}).items():
+                if isinstance(task, dict):
+                    rows.extend((question, task_type, ability) for question in task.get('questions', ()))
+        self.add_questions(lesson_data, rows)
+        return len(rows)
+
+    def add_questions(self, lesson_data, rows):
+        """Queue (text, task_type, ability) rows for one lesson, e.g. from a bulk import"""
+        if not rows:
+            return
+        levels = classifier.classify_batch([text for text, _, _ in rows])
+        now = time.time()
+        self._queue.put([
+            (text, str(lesson_data['grade']), lesson_data['subject'], lesson_data['topic'], level,
+             task_type, ability, now)
+            for (text, task_type, ability), level in zip(rows, levels)
+        ])
+        self._start_writer()
+
+    def flush(self):
+        """Block until every queued question is written"""
+        self._queue.join()
+
+    def query(self, subject=None, grade=None, topic=None, dok=None, task_type=None, text=None, limit=100):
+        """Stored questions matching every given filter, newest first"""
+        clauses, params = [], []
+        for column, value in (('subject', subject), ('grade', grade), ('topic', topic),
+                              ('dok', dok), ('task_type', task_type)):
+            if value is not None:
+                clauses.append(f"q.{column} = ?")
+                params.append(str(value) if column == 'grade' else value)
+
+        source = 'questions q'
+        # Whitespace-only text is no filter (and would be an empty FTS5 MATCH)
+        if text and text.strip():
+            if self.full_text:
+                source = 'questions_fts JOIN questions q ON q.id = questions_fts.rowid'
+                clauses.append('questions_fts MATCH ?')
+                params.append(_fts_query(text))
+            else:
+                clauses.append("(q.text LIKE ? ESCAPE '\\' OR q.topic LIKE ? ESCAPE '\\')")
+                pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                params.extend([pattern, pattern])
+
+        sql = f"SELECT {', '.join('q.' + column for column in COLUMNS)} FROM {source}"
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY q.created DESC, q.id DESC LIMIT ?'
+        params.append(limit)
+        return [dict(zip(COLUMNS, row)) for row in self._connect().execute(sql, params)]
+
+    def assemble_unit(self, subject, grade, topics=None, per_level=10):
+        """Question bank for a unit: up to per_level distinct questions for each DOK level
+
+        topics limits the unit to those lessons; without it every topic stored for the
+        subject and grade is used.
+        """
+        sql = 'SELECT text, topic, task_type, ability FROM questions WHERE subject = ? AND grade = ? AND dok = ?'
+        params = [subject, str(grade)]
+        if topics:
+            sql += f" AND topic IN ({', '.join('?' * len(topics))})"
+            params.extend(topics)
+        sql += ' GROUP BY text ORDER BY topic, min(id) LIMIT ?'
+
+        db = self._connect()
+        levels = {}
+        for level, label in DOK_LEVELS.items():
+            rows = db.execute(sql, params[:2] + [level] + params[2:] + [per_level]).fetchall()
+            levels[level] = {
+                'label': label,
+                'questions': [dict(zip(('text', 'topic', 'task_type', 'ability'), row)) for row in rows]
+            }
+        return {'subject': subject, 'grade': str(grade), 'topics': list(topics or []), 'levels': levels}
+
+    def stats(self):
+        count, topics = self._connect().execute(
+            'SELECT count(*), count(DISTINCT subject || grade || topic) FROM questions').fetchone()
+        return {
+            'questions': count,
+            'topics': topics,
+            'pending_batches': self._queue.qsize(),
+            'full_text': self.full_text
+        }
+
+    def _start_writer(self):
+        # Started lazily so it is created in the process that serves requests
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name='question-writer', daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batches = [self._queue.get()]
+            # Drain whatever else is waiting into the same transaction
+            while sum(len(batch) for batch in batches) < self.batch_size:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._connect() as db:
+                    db.executemany(
+                        'INSERT OR IGNORE INTO questions (text, grade, subject, topic, dok, task_type, ability, created) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        [row for batch in batches for row in batch])
+            except Exception as e:
+                print(f"Error writing question store: {str(e)}")
+            finally:
+                for _ in batches:
+                    self._queue.task_done()
+
+    def _connect(self):
+        """One connection per thread and process"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+
+def _fts_query(text):
+    """Search words as quoted FTS5 terms, so user input cannot break the query syntax"""
+    terms = [word.replace('"', '""') for word in text.split()]
+    return ' '.join(f'"{term}"' for term in terms)
@@ -0,0 +1,187 @@
+"""
+Output Storage
+Tracks generated packages in a SQLite index, shards them into subfolders and keeps the
+output folder within a byte/count quota with least-recently-used eviction
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import sqlite3
+import threading
+
+# Temporary files older than this were left by a crashed writer and are removed by sweep()
+PARTIAL_FILE_AGE = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    id TEXT PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT,
+    created REAL NOT NULL,
+    last_downloaded REAL
+);
+CREATE INDEX IF NOT EXISTS artifacts_last_used ON artifacts (coalesce(last_downloaded, created));
+"""
+
+
+class StorageManager:
+    """Index of generated files shared by all worker processes through SQLite"""
+
+    def __init__(self, folder, max_bytes=2048 * 1024 * 1024, max_files=5000, ttl=24 * 3600,
+                 sweep_interval=300):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        os.makedirs(self.folder, exist_ok=True)
+        self.index_path = os.path.join(self.folder, 'index.sqlite3')
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sweeper = None
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            # Indexes created before content hashes were stored
+            columns = [row[1] for row in db.execute('PRAGMA table_info(artifacts)')]
+            if 'sha256' not in columns:
+                db.execute('ALTER TABLE artifacts ADD COLUMN sha256 TEXT')
+
+    def path_for(self, name):
+        """Sharded location for a new file: <folder>/<2 hex chars>/<name>"""
+        shard = hashlib.sha1(name.encode('utf-8')).hexdigest()[:2]
+        os.makedirs(os.path.join(self.folder, shard), exist_ok=True)
+        return os.path.join(self.folder, shard, name)
+
+    def add(self, path):
+        """Register a file written to path_for() and return its opaque artifact id"""
+        self._start_sweeper()
+        artifact_id = uuid.uuid4().hex
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO artifacts (id, name, path, size, sha256, created) '
+                       'VALUES (?, ?, ?, ?, ?, ?)',
+                       (artifact_id, os.path.basename(path), path, os.path.getsize(path),
+                        digest.hexdigest(), time.time()))
+        self._enforce_quota()
+        return artifact_id
+
+    def get(self, artifact_id):
+        """{'id', 'name', 'path', 'size', 'sha256'} of a stored file, or None if it is unknown or gone"""
+        self._start_sweeper()
+        row = self._connect().execute('SELECT id, name, path, size, sha256 FROM artifacts WHERE id = ?',
+                                      (artifact_id,)).fetchone()
+        if row is None:
+            return None
+        artifact = dict(zip(('id', 'name', 'path', 'size', 'sha256'), row))
+        if not os.path.exists(artifact['path']):
+            self._forget([artifact['name']])
+            return None
+        return artifact
+
+    def mark_downloaded(self, artifact_id):
+        with self._connect() as db:
+            db.execute('UPDATE artifacts SET last_downloaded = ? WHERE id = ?', (time.time(), artifact_id))
+
+    def stats(self):
+        count, size = self._connect().execute(
+            'SELECT count(*), coalesce(sum(size), 0) FROM artifacts').fetchone()
+        return {
+            'files': count,
+            'bytes': size,
+            'max_files': self.max_files,
+            'max_bytes': self.max_bytes
+        }
+
+    def sweep(self):
+        """Delete expired files, drop index rows whose file vanished, then enforce the quota"""
+        cutoff = time.time() - self.ttl
+        rows = self._connect().execute(
+            'SELECT name, path FROM artifacts WHERE coalesce(last_downloaded, created) < ?', (cutoff,)).fetchall()
+        self._delete(rows)
+
+        missing = [name for name, path in self._connect().execute('SELECT name, path FROM artifacts')
+                   if not os.path.exists(path)]
+        self._forget(missing)
+        self._enforce_quota()
+        return len(rows) + len(missing) + self._remove_partial_files()
+
+    def _remove_partial_files(self):
+        """Delete stale *.tmp files that a killed worker never renamed into place"""
+        cutoff = time.time() - PARTIAL_FILE_AGE
+        removed = 0
+        for shard in os.scandir(self.folder):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    if entry.name.endswith('.tmp') and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def _enforce_quota(self):
+        """Evict least recently used files until both limits hold"""
+        db = self._connect()
+        count, size = db.execute('SELECT count(*), coalesce(sum(size), 0) FROM artifacts').fetchone()
+        if count <= self.max_files and size <= self.max_bytes:
+            return
+
+        victims = []
+        for name, path, file_size in db.execute(
+                'SELECT name, path, size FROM artifacts ORDER BY coalesce(last_downloaded, created)'):
+            if count <= self.max_files and size <= self.max_bytes:
+                break
+            victims.append((name, path))
+            count -= 1
+            size -= file_size
+        self._delete(victims)
+
+    def _delete(self, rows):
+        for _, path in rows:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._forget([name for name, _ in rows])
+
+    def _forget(self, names):
+        if names:
+            with self._connect() as db:
+                db.executemany('DELETE FROM artifacts WHERE name = ?', [(name,) for name in names])
+
+    def _connect(self):
+        """One connection per thread and process"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.index_path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _start_sweeper(self):
+        # Started lazily so it is created in the process that serves requests
+        with self._lock:
+            if self._sweeper is None or not self._sweeper.is_alive():
+                self._sweeper = threading.Thread(target=self._sweep_loop, name='storage-sweeper', daemon=True)
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                removed = self.sweep()
+                if removed:
+                    print(f"Storage sweep removed {removed} files")
+            except Exception as e:
+                print(f"Error sweeping output storage: {str(e)}")
+            time.sleep(self.sweep_interval)
@@ -0,0 +1,127 @@
+"""
+Template Pool
+Keeps pre-parsed copies of a document template ready so requests only fill them in
+"""
+
+import io
+import os
+import threading
+from collections import deque
+
+
+class TemplatePool:
+    """Pool of parsed template copies built from one in-memory snapshot of the file
+
+    The file is read once and re-read only when its modification time changes.
+    Each acquire() hands out a private, already parsed copy and a background
+    thread parses a replacement, so the request path never touches the disk.
+    An optional indexer(document) is run once per template version and its
+    result is handed out with every copy. An optional fallback() returns the
+    template bytes to use while the file does not exist.
+    """
+
+    def __init__(self, path, loader, size=4, indexer=None, fallback=None):
+        self.path = path
+        self.loader = loader
+        self.size = size
+        self.indexer = indexer
+        self.fallback = fallback
+
+        self._copies = deque()
+        self._snapshot = None
+        self._index = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._refill = threading.Event()
+        self._refill_thread = None
+
+    def warm(self):
+        """Load the template and parse a full pool up front"""
+        self._check_reload()
+        while True:
+            with self._lock:
+                snapshot, generation = self._snapshot, self._mtime
+                if snapshot is None or len(self._copies) >= self.size:
+                    return
+            self._add_copy(snapshot, generation)
+
+    def acquire(self):
+        """Return (parsed copy, index) for the template, or (None, None) if it does not exist and has no fallback"""
+        self._check_reload()
+        with self._lock:
+            snapshot, index = self._snapshot, self._index
+            copy = self._copies.popleft() if self._copies else None
+        if snapshot is None:
+            return None, None
+
+        self._request_refill()
+        if copy is None:
+            copy = self.loader(io.BytesIO(snapshot))
+        return copy, index
+
+    def reload(self):
+        """Re-read the template from disk and drop copies of the old version"""
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, 'rb') as f:
+                snapshot = f.read()
+        except OSError:
+            mtime, snapshot = None, None
+            if self.fallback is not None:
+                snapshot = self.fallback()
+
+        index = None
+        if snapshot is not None and self.indexer is not None:
+            index = self.indexer(self.loader(io.BytesIO(snapshot)))
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._index = index
+            self._mtime = mtime
+            self._copies.clear()
+        if mtime is not None:
+            print(f"Loaded template {self.path} ({len(snapshot)} bytes)")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'path': self.path,
+                'loaded': self._snapshot is not None,
+                'fallback': self._snapshot is not None and self._mtime is None,
+                'ready_copies': len(self._copies)
+            }
+
+    def _check_reload(self):
+        """Reload when the file appeared, disappeared or was modified, or the fallback is not loaded yet"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        missing = self._snapshot is None and (mtime is not None or self.fallback is not None)
+        if mtime != self._mtime or missing:
+            self.reload()
+
+    def _add_copy(self, snapshot, generation):
+        copy = self.loader(io.BytesIO(snapshot))
+        with self._lock:
+            # Discard copies parsed from a template that has since been replaced
+            if generation == self._mtime and len(self._copies) < self.size:
+                self._copies.append(copy)
+
+    def _request_refill(self):
+        # The refill thread is started lazily so it is created in the process that uses it
+        with self._lock:
+            if self._refill_thread is None or not self._refill_thread.is_alive():
+                self._refill_thread = threading.Thread(target=self._refill_loop, name='template-refill',
+                                                       daemon=True)
+                self._refill_thread.start()
+        self._refill.set()
+
+    def _refill_loop(self):
+        while True:
+            self._refill.wait()
+            self._refill.clear()
+            try:
+                self.warm()
+            except Exception as e:
+                print(f"Error refilling template pool for {self.path}: {str(e)}")